@@ -3,7 +3,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from .models import Article, ReadingStats, CacheHitStats
+from .models import Article, ArticleViewRollup, ReadingStats, CacheHitStats
 
 
 @admin.register(Article)
@@ -21,10 +21,14 @@ class ArticleAdmin(admin.ModelAdmin):
         ('时间信息', {
             'fields': ['created_at', 'updated_at'],
             'classes': ['collapse']
+        }),
+        ('阅读统计', {
+            'fields': ['total_views', 'unique_users', 'unique_ips'],
+            'classes': ['collapse']
         })
     ]
     
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'total_views', 'unique_users', 'unique_ips']
     
     def view_stats_link(self, obj):
         """显示查看统计的链接"""
@@ -102,6 +106,22 @@ class CacheHitStatsAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(ArticleViewRollup)
+class ArticleViewRollupAdmin(admin.ModelAdmin):
+    list_display = ['article', 'bucket_start', 'views', 'unique_visitors']
+    list_filter = ['bucket_start']
+    date_hierarchy = 'bucket_start'
+    ordering = ['-bucket_start']
+    list_select_related = ['article']
+    
+    # 只读字段，数据由定时任务从Redis落库
+    readonly_fields = ['article', 'bucket_start', 'views', 'unique_visitors']
+    
+    def has_add_permission(self, request):
+        """禁止手动添加小时阅读量"""
+        return False
+
+
 # 自定义管理页面标题
 admin.site.site_header = "博客阅读量统计系统"
 admin.site.site_title = "博客管理"
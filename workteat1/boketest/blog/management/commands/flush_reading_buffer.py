@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.reading_service import ReadingStatsService
+
+
+class Command(BaseCommand):
+    help = '将写回缓冲中的阅读事件批量落库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-batches', type=int, default=None, help='最多处理的批次数')
+
+    def handle(self, *args, **options):
+        flushed = ReadingStatsService().flush_reading_buffer(options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(f'阅读缓冲落库完成: {flushed}条事件'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.reading_service import ReadingStatsService
+
+
+class Command(BaseCommand):
+    help = '将Redis中按小时累加的文章阅读量写入ArticleViewRollup'
+
+    def handle(self, *args, **options):
+        written = ReadingStatsService().flush_view_rollups()
+        self.stdout.write(self.style.SUCCESS(f'小时阅读量落库完成: {written}行'))
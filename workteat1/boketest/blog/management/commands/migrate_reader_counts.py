@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.cache_service import ReadingCacheService
+
+
+class Command(BaseCommand):
+    help = '把旧布局的用户/IP阅读次数键（user_reading:*、ip_reading:*）迁移到分桶哈希'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批SCAN和迁移的键数')
+
+    def handle(self, *args, **options):
+        migrated = ReadingCacheService().migrate_legacy_reader_counts(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'阅读次数迁移完成: {migrated}个键'))
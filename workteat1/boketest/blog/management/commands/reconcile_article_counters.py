@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.reading_service import ReadingStatsService
+
+
+class Command(BaseCommand):
+    help = '用阅读记录校准文章上的独立用户/IP数，并用文章总阅读量覆盖Redis计数器'
+
+    def add_arguments(self, parser):
+        parser.add_argument('article_ids', nargs='*', type=int, help='只校准指定文章，默认全部')
+        parser.add_argument('--include-total-views', action='store_true', help='同时把总阅读量补齐到阅读记录之和（只增不减）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每条UPDATE语句处理的文章数')
+
+    def handle(self, *args, **options):
+        reconciled = ReadingStatsService().reconcile_article_counters(
+            options['article_ids'] or None,
+            include_total_views=options['include_total_views'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'文章计数对账完成: {reconciled}篇文章'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.dashboard_service import DashboardService
+
+
+class Command(BaseCommand):
+    help = '重新生成所有窗口的仪表板快照'
+
+    def handle(self, *args, **options):
+        service = DashboardService()
+        windows = service.reading_service.cache_service.LEADERBOARD_WINDOWS
+        for window in windows:
+            service.refresh_snapshot(window)
+        self.stdout.write(self.style.SUCCESS(f'仪表板快照生成完成: {len(windows)}个'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from blog.services.scheduler import PeriodicScheduler, get_default_jobs
+
+
+class Command(BaseCommand):
+    help = '运行周期任务调度器（同步缓存统计、小时阅读量落库、文章计数对账），多节点运行时只有主节点执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='执行一轮到期任务后退出（配合cron使用）')
+        parser.add_argument('--tick', type=float, default=5, help='检查任务和续期主节点锁的间隔秒数')
+
+    def handle(self, *args, **options):
+        scheduler = PeriodicScheduler(get_default_jobs(), tick=options['tick'])
+        if options['once']:
+            executed = scheduler.run_pending()
+            if not scheduler.is_leader:
+                self.stdout.write(self.style.WARNING('其他节点正在运行调度器，本次跳过'))
+                return
+            scheduler.lock.release()
+            self.stdout.write(self.style.SUCCESS(
+                f"已执行: {', '.join(name for name, ran in executed.items() if ran)}"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS('调度器已启动'))
+        scheduler.run_forever()
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Article',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='标题')),
+                ('content', models.TextField(verbose_name='内容')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_published', models.BooleanField(default=True, verbose_name='是否发布')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='作者')),
+            ],
+            options={
+                'verbose_name': '文章',
+                'verbose_name_plural': '文章',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CacheHitStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=django.utils.timezone.now, verbose_name='统计日期')),
+                ('hour', models.PositiveSmallIntegerField(default=0, verbose_name='小时')),
+                ('total_requests', models.PositiveIntegerField(default=0, verbose_name='总请求数')),
+                ('cache_hits', models.PositiveIntegerField(default=0, verbose_name='缓存命中数')),
+            ],
+            options={
+                'verbose_name': '缓存命中率统计',
+                'verbose_name_plural': '缓存命中率统计',
+                'unique_together': {('date', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReadingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP地址')),
+                ('user_agent', models.CharField(blank=True, max_length=500, null=True, verbose_name='用户代理')),
+                ('read_count', models.PositiveIntegerField(default=1, verbose_name='阅读次数')),
+                ('first_read_at', models.DateTimeField(auto_now_add=True, verbose_name='首次阅读时间')),
+                ('last_read_at', models.DateTimeField(auto_now=True, verbose_name='最后阅读时间')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.article', verbose_name='文章')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '阅读统计',
+                'verbose_name_plural': '阅读统计',
+                'unique_together': {('article', 'user', 'ip_address')},
+            },
+        ),
+    ]
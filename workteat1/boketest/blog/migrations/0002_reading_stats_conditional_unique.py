@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_reading_stats(apps, schema_editor):
+    """
+    合并重复的阅读统计：登录用户按(文章, 用户)合并，匿名访问按(文章, IP)合并
+    
+    保留最早的一条记录，累加阅读次数，保留最早的首次阅读时间和最近的IP、用户代理、最后阅读时间
+    """
+    ReadingStats = apps.get_model('blog', 'ReadingStats')
+    
+    groups = [
+        (['article_id', 'user_id'], ReadingStats.objects.filter(user__isnull=False)),
+        (['article_id', 'ip_address'], ReadingStats.objects.filter(user__isnull=True)),
+    ]
+    for fields, queryset in groups:
+        duplicates = queryset.values(*fields).annotate(rows=Count('id')).filter(rows__gt=1)
+        for duplicate in duplicates.iterator():
+            rows = list(queryset.filter(**{field: duplicate[field] for field in fields}).order_by('id'))
+            keeper = rows[0]
+            latest = max(rows, key=lambda row: row.last_read_at)
+            keeper.read_count = sum(row.read_count for row in rows)
+            keeper.first_read_at = min(row.first_read_at for row in rows)
+            keeper.last_read_at = latest.last_read_at
+            keeper.ip_address = latest.ip_address
+            keeper.user_agent = latest.user_agent or keeper.user_agent
+            ReadingStats.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+            # 使用update避免auto_now覆盖最后阅读时间
+            ReadingStats.objects.filter(id=keeper.id).update(
+                read_count=keeper.read_count,
+                first_read_at=keeper.first_read_at,
+                last_read_at=keeper.last_read_at,
+                ip_address=keeper.ip_address,
+                user_agent=keeper.user_agent
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='readingstats',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_duplicate_reading_stats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='readingstats',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('article', 'user'), name='uniq_reading_stats_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='readingstats',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('article', 'ip_address'), name='uniq_reading_stats_anonymous_ip'),
+        ),
+    ]
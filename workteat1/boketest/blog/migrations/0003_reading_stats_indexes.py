@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_reading_stats_conditional_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='readingstats',
+            index=models.Index(fields=['article', 'read_count'], name='reading_stats_art_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingstats',
+            index=models.Index(condition=models.Q(('ip_address__isnull', False)), fields=['article', 'ip_address'], name='reading_stats_art_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readingstats',
+            index=models.Index(fields=['last_read_at'], name='reading_stats_last_read_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_article_view_counters(apps, schema_editor):
+    """
+    用已有的阅读统计初始化文章上的计数
+    """
+    Article = apps.get_model('blog', 'Article')
+    ReadingStats = apps.get_model('blog', 'ReadingStats')
+    
+    stats = ReadingStats.objects.filter(article=OuterRef('pk')).order_by().values('article')
+    Article.objects.update(
+        total_views=Coalesce(Subquery(stats.annotate(value=Sum('read_count')).values('value')), 0),
+        unique_users=Coalesce(Subquery(stats.annotate(value=Count('user', distinct=True)).values('value')), 0),
+        unique_ips=Coalesce(Subquery(stats.annotate(value=Count('ip_address', distinct=True)).values('value')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_reading_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='total_views',
+            field=models.PositiveIntegerField(default=0, verbose_name='总阅读量'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='unique_ips',
+            field=models.PositiveIntegerField(default=0, verbose_name='独立IP数'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='unique_users',
+            field=models.PositiveIntegerField(default=0, verbose_name='独立用户数'),
+        ),
+        migrations.RunPython(backfill_article_view_counters, migrations.RunPython.noop),
+    ]
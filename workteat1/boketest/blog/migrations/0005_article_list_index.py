@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_article_view_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='article_published_list_idx'),
+        ),
+    ]
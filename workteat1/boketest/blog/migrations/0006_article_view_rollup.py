@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_article_list_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(verbose_name='小时起始时间')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='阅读量')),
+                ('unique_visitors', models.PositiveIntegerField(default=0, verbose_name='独立访客数')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.article', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '文章小时阅读量',
+                'verbose_name_plural': '文章小时阅读量',
+                'ordering': ['article', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('article', 'bucket_start'), name='uniq_article_view_rollup')],
+            },
+        ),
+    ]
@@ -13,11 +13,19 @@ class Article(models.Model):
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
     is_published = models.BooleanField('是否发布', default=True)
+    # 反范式阅读计数：总阅读量由写入路径用F()递增，独立用户/IP数由对账任务校准
+    total_views = models.PositiveIntegerField('总阅读量', default=0)
+    unique_users = models.PositiveIntegerField('独立用户数', default=0)
+    unique_ips = models.PositiveIntegerField('独立IP数', default=0)
     
     class Meta:
         verbose_name = '文章'
         verbose_name_plural = '文章'
         ordering = ['-created_at']
+        indexes = [
+            # 文章列表按(created_at, id)游标分页
+            models.Index(fields=['is_published', '-created_at', '-id'], name='article_published_list_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -38,7 +46,33 @@ class ReadingStats(models.Model):
     class Meta:
         verbose_name = '阅读统计'
         verbose_name_plural = '阅读统计'
-        unique_together = ['article', 'user', 'ip_address']  # 防止重复统计
+        # 防止重复统计：登录用户按(文章, 用户)唯一，匿名访问按(文章, IP)唯一
+        # user为NULL时普通的联合唯一约束不生效，因此拆成两个条件唯一约束
+        constraints = [
+            models.UniqueConstraint(
+                fields=['article', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='uniq_reading_stats_user'
+            ),
+            models.UniqueConstraint(
+                fields=['article', 'ip_address'],
+                condition=models.Q(user__isnull=True),
+                name='uniq_reading_stats_anonymous_ip'
+            ),
+        ]
+        # (文章, 用户)的查询由上面的条件唯一约束覆盖
+        indexes = [
+            # 按文章汇总阅读次数时只扫描索引
+            models.Index(fields=['article', 'read_count'], name='reading_stats_art_count_idx'),
+            # 按文章统计独立IP
+            models.Index(
+                fields=['article', 'ip_address'],
+                condition=models.Q(ip_address__isnull=False),
+                name='reading_stats_art_ip_idx'
+            ),
+            # 后台按最后阅读时间排序和筛选
+            models.Index(fields=['last_read_at'], name='reading_stats_last_read_idx'),
+        ]
     
     def __str__(self):
         user_info = f'用户{self.user.username}' if self.user else f'IP{self.ip_address}'
@@ -68,3 +102,24 @@ class CacheHitStats(models.Model):
     
     def __str__(self):
         return f'{self.date} {self.hour}时 - 命中率{self.hit_rate}%'
+
+
+class ArticleViewRollup(models.Model):
+    """
+    文章按小时汇总的阅读量，由阅读路径先在Redis中累加，再批量落库
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, verbose_name='文章')
+    bucket_start = models.DateTimeField('小时起始时间')
+    views = models.PositiveIntegerField('阅读量', default=0)
+    unique_visitors = models.PositiveIntegerField('独立访客数', default=0)
+    
+    class Meta:
+        verbose_name = '文章小时阅读量'
+        verbose_name_plural = '文章小时阅读量'
+        ordering = ['article', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'bucket_start'], name='uniq_article_view_rollup'),
+        ]
+    
+    def __str__(self):
+        return f'{self.article_id} {self.bucket_start:%Y-%m-%d %H}时 - {self.views}次'
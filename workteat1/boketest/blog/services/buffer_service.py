@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List, Callable, Optional
+from django.conf import settings
+
+from .cache_service import CacheService
+
+
+logger = logging.getLogger(__name__)
+
+
+# 进程内缓冲（Redis不可用时使用），同一进程内的所有服务实例共享
+_local_buffer = deque()
+_buffer_lock = threading.Lock()
+_buffer_pid = os.getpid()
+
+
+def _ensure_process_buffer():
+    """
+    fork之后子进程会继承父进程的缓冲副本，需要清空避免重复落库
+    """
+    global _buffer_pid
+    if _buffer_pid != os.getpid():
+        with _buffer_lock:
+            _local_buffer.clear()
+            _buffer_pid = os.getpid()
+
+
+class ReadingBufferService(CacheService):
+    """
+    阅读事件写回缓冲服务 - 阅读事件先进入Redis列表（或进程内缓冲），再由刷新线程批量落库
+    """
+
+    BUFFER_KEY = "reading_buffer:events"
+    DEAD_LETTER_KEY = "reading_buffer:dead"
+
+    def is_enabled(self) -> bool:
+        """是否启用写回模式"""
+        return getattr(settings, 'READING_WRITE_BEHIND_ENABLED', False)
+
+    @property
+    def batch_size(self) -> int:
+        return getattr(settings, 'READING_WRITE_BEHIND_BATCH_SIZE', 500)
+
+    @property
+    def flush_interval(self) -> float:
+        """刷新间隔（秒），即进程内缓冲的最大丢失窗口"""
+        return getattr(settings, 'READING_WRITE_BEHIND_FLUSH_INTERVAL_MS', 1000) / 1000.0
+
+    def push_event(self, event: Dict[str, Any]) -> int:
+        """
+        追加阅读事件，返回当前缓冲长度
+        """
+        _ensure_process_buffer()
+
+        if self.available:
+            try:
+                return self.redis_client.rpush(self.BUFFER_KEY, json.dumps(event, ensure_ascii=False))
+            except Exception as e:
+                logger.warning(f"阅读事件写入Redis缓冲失败，转入进程内缓冲: {e}")
+
+        with _buffer_lock:
+            _local_buffer.append(event)
+            return len(_local_buffer)
+
+    def drain_events(self, max_events: int = None) -> List[Dict[str, Any]]:
+        """
+        取出一批待落库的阅读事件（进程内缓冲优先）
+        """
+        _ensure_process_buffer()
+        max_events = max_events or self.batch_size
+        events = []
+
+        with _buffer_lock:
+            while _local_buffer and len(events) < max_events:
+                events.append(_local_buffer.popleft())
+
+        remaining = max_events - len(events)
+        if remaining > 0 and self.available:
+            try:
+                # LRANGE + LTRIM 放在同一个事务中，多进程并发刷新时不会重复取出
+                pipe = self.redis_client.pipeline(transaction=True)
+                pipe.lrange(self.BUFFER_KEY, 0, remaining - 1)
+                pipe.ltrim(self.BUFFER_KEY, remaining, -1)
+                raw_events, _ = pipe.execute()
+                for raw in raw_events:
+                    try:
+                        events.append(json.loads(raw))
+                    except (json.JSONDecodeError, TypeError):
+                        logger.error(f"丢弃无法解析的阅读事件: {raw}")
+            except Exception as e:
+                logger.error(f"读取Redis阅读缓冲失败: {e}")
+
+        return events
+
+    def restore_events(self, events: List[Dict[str, Any]]):
+        """
+        落库失败时将事件放回缓冲，等待下次刷新
+        """
+        if not events:
+            return
+        if self.available:
+            try:
+                self.redis_client.lpush(
+                    self.BUFFER_KEY,
+                    *[json.dumps(event, ensure_ascii=False) for event in reversed(events)]
+                )
+                return
+            except Exception as e:
+                logger.warning(f"阅读事件放回Redis缓冲失败，转入进程内缓冲: {e}")
+        with _buffer_lock:
+            _local_buffer.extendleft(reversed(events))
+
+    def retry_events(self, events: List[Dict[str, Any]]) -> int:
+        """
+        落库失败后记录失败次数：未超过READING_WRITE_BEHIND_MAX_ATTEMPTS的放回缓冲，其余移入死信队列，
+        返回移入死信队列的事件数
+        """
+        max_attempts = getattr(settings, 'READING_WRITE_BEHIND_MAX_ATTEMPTS', 5)
+        retry, dead = [], []
+        for event in events:
+            event['attempts'] = event.get('attempts', 0) + 1
+            (dead if event['attempts'] >= max_attempts else retry).append(event)
+
+        self.restore_events(retry)
+        if dead:
+            self.dead_letter_events(dead)
+        return len(dead)
+
+    def dead_letter_events(self, events: List[Dict[str, Any]]):
+        """
+        多次落库失败的事件移入死信队列（Redis列表），不再阻塞后续事件；Redis不可用时只记录日志
+        """
+        logger.error(f"阅读事件多次落库失败，移入死信队列: {len(events)}条")
+        try:
+            if self.available:
+                self.redis_client.rpush(
+                    self.DEAD_LETTER_KEY,
+                    *[json.dumps(event, ensure_ascii=False) for event in events]
+                )
+                return
+        except Exception as e:
+            logger.error(f"阅读事件写入死信队列失败: {e}")
+        logger.error(f"丢弃多次落库失败的阅读事件: {json.dumps(events, ensure_ascii=False)}")
+
+
+class ReadingBufferFlusher(threading.Thread):
+    """
+    后台刷新线程 - 每隔固定时间或缓冲达到批量阈值时触发落库
+    """
+
+    def __init__(self, flush_func: Callable[[], int], interval: float):
+        super().__init__(name='reading-buffer-flusher', daemon=True)
+        self.flush_func = flush_func
+        self.interval = interval
+        self._wakeup = threading.Event()
+
+    def wakeup(self):
+        """缓冲达到批量阈值时提前唤醒"""
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush_func()
+            except Exception as e:
+                logger.error(f"阅读缓冲刷新失败: {e}")
+
+
+_flusher: Optional[ReadingBufferFlusher] = None
+_flusher_lock = threading.Lock()
+_flusher_pid = None
+
+
+def get_flusher(flush_func: Callable[[], int], interval: float) -> ReadingBufferFlusher:
+    """
+    获取当前进程的刷新线程（按需启动，fork后在子进程中重新启动）
+    """
+    global _flusher, _flusher_pid
+    with _flusher_lock:
+        if _flusher is None or _flusher_pid != os.getpid():
+            _flusher = ReadingBufferFlusher(flush_func, interval)
+            _flusher.start()
+            _flusher_pid = os.getpid()
+            # 进程退出前尽量把进程内缓冲落库
+            atexit.register(flush_func)
+        return _flusher
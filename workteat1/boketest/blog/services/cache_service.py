@@ -1,72 +1,296 @@
-import json
+import atexit
+import ipaddress
 import logging
+import math
+import os
+import random
+import threading
+import time
+import zlib
 import redis
+from redis.client import NEVER_DECODE
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterable, List, Optional, Union
 from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .codecs import get_codec
+from .local_cache import get_local_cache
 
 
 logger = logging.getLogger(__name__)
 
 
-class CacheService:
+class CircuitBreaker:
     """
-    Redis缓存服务类 - 面向对象封装
+    Redis熔断器 - 连续失败达到阈值后熔断（快速失败），每隔探测间隔放行一次探测，探测成功即恢复
+    
+    状态：closed（正常）-> open（熔断）-> half_open（探测中）-> closed/open
     """
     
-    def __init__(self):
-        """初始化Redis连接"""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, probe_interval: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self, probe) -> bool:
+        """
+        是否放行请求；熔断超过探测间隔时由当前调用方执行一次探测
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN or time.monotonic() - self.opened_at < self.probe_interval:
+                return False
+            self.state = self.HALF_OPEN
+        
         try:
-            self.redis_client = redis.Redis(
-                host=getattr(settings, 'REDIS_HOST', '127.0.0.1'),
-                port=getattr(settings, 'REDIS_PORT', 6379),
-                db=getattr(settings, 'REDIS_DB', 1),
-                decode_responses=True
-            )
-            # 测试连接
-            self.redis_client.ping()
-            self.available = True
+            probe()
         except Exception as e:
-            logger.error(f"Redis连接失败: {e}")
-            self.available = False
+            logger.warning(f"Redis探测失败，保持熔断: {e}")
+            self.record_failure()
+            return False
+        logger.info("Redis探测成功，熔断恢复")
+        self.record_success()
+        return True
+    
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"Redis连续失败{self.failures}次，熔断{self.probe_interval}秒")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# 只有连接类错误计入熔断，命令本身的错误（如类型错误）不计入
+BREAKER_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+
+class BreakerPipeline(redis.client.Pipeline):
+    """
+    执行结果反馈给熔断器的管道
+    """
+    
+    def execute(self, raise_on_error=True):
+        try:
+            result = super().execute(raise_on_error)
+        except BREAKER_ERRORS:
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return result
+
+
+class BreakerRedis(redis.Redis):
+    """
+    执行结果反馈给熔断器的Redis客户端
+    """
+    
+    def __init__(self, circuit_breaker: CircuitBreaker, **kwargs):
+        super().__init__(**kwargs)
+        self.circuit_breaker = circuit_breaker
+    
+    def execute_command(self, *args, **options):
+        try:
+            result = super().execute_command(*args, **options)
+        except BREAKER_ERRORS:
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return result
+    
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = BreakerPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.circuit_breaker = self.circuit_breaker
+        return pipe
+
+
+class L1InvalidationListener(threading.Thread):
+    """
+    L1缓存失效订阅线程 - 收到文章ID后清除本进程的对应缓存
+    """
+    
+    RETRY_INTERVAL = 5
+    
+    def __init__(self, channel: str, evict):
+        super().__init__(name='l1-invalidation-listener', daemon=True)
+        self.channel = channel
+        self.evict = evict
+    
+    def run(self):
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # 断线期间可能漏掉失效通知，重新订阅后清空L1
+                get_local_cache().clear()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self.evict(int(message['data']))
+            except Exception as e:
+                logger.warning(f"L1缓存失效订阅中断，{self.RETRY_INTERVAL}秒后重试: {e}")
+                time.sleep(self.RETRY_INTERVAL)
+
+
+_redis_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_redis_client() -> BreakerRedis:
+    """
+    获取进程级共享的Redis客户端（所有CacheService子类共用一个连接池和熔断器）
+    
+    gunicorn等预fork模式下，子进程不能复用父进程的连接，检测到pid变化时重建连接池
+    """
+    global _redis_client, _client_pid
+    if _redis_client is not None and _client_pid == os.getpid():
+        return _redis_client
+    
+    with _client_lock:
+        if _redis_client is None or _client_pid != os.getpid():
+            options = {
+                'db': getattr(settings, 'REDIS_DB', 1),
+                'decode_responses': True,
+                'max_connections': getattr(settings, 'REDIS_MAX_CONNECTIONS', 50),
+                'socket_timeout': getattr(settings, 'REDIS_SOCKET_TIMEOUT', 1.0),
+                'socket_connect_timeout': getattr(settings, 'REDIS_SOCKET_CONNECT_TIMEOUT', 0.5),
+                'health_check_interval': getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+            }
+            unix_socket = getattr(settings, 'REDIS_UNIX_SOCKET', None)
+            if unix_socket:
+                pool = redis.ConnectionPool(
+                    connection_class=redis.UnixDomainSocketConnection,
+                    path=unix_socket,
+                    **options
+                )
+            else:
+                pool = redis.ConnectionPool(
+                    host=getattr(settings, 'REDIS_HOST', '127.0.0.1'),
+                    port=getattr(settings, 'REDIS_PORT', 6379),
+                    **options
+                )
+            circuit_breaker = CircuitBreaker(
+                failure_threshold=getattr(settings, 'REDIS_CIRCUIT_FAILURE_THRESHOLD', 5),
+                probe_interval=getattr(settings, 'REDIS_CIRCUIT_PROBE_INTERVAL', 5.0)
+            )
+            _redis_client = BreakerRedis(circuit_breaker, connection_pool=pool)
+            _client_pid = os.getpid()
+        return _redis_client
+
+
+class CacheService:
+    """
+    Redis缓存服务类 - 面向对象封装
+    """
+    
+    # 缓存命中率统计：每天一个哈希，字段为"{hour}:total|hits|l1_hits"
+    CACHE_STATS_KEY = "cache_stats:{date}"
+    
+    # get/set的编码方式 {键前缀: 编码}，按最长前缀匹配，未匹配的使用CACHE_DEFAULT_CODEC；
+    # 可用settings.CACHE_KEY_CODECS覆盖
+    KEY_CODECS: Dict[str, str] = {}
+    # 按(服务类, 键族)缓存解析好的编码 {(cls, family): ([(前缀, 编解码器)], 默认编解码器)}
+    _codec_families: Dict[tuple, tuple] = {}
+    
+    @property
+    def redis_client(self) -> BreakerRedis:
+        """共享的Redis客户端（构造服务时不建立连接）"""
+        return get_redis_client()
+    
+    @property
+    def available(self) -> bool:
+        """
+        Redis是否可用 - 由熔断器判断，熔断期间快速失败，恢复后自动可用
+        """
+        client = self.redis_client
+        return client.circuit_breaker.allow_request(client.ping)
+    
+    def circuit_state(self) -> str:
+        """熔断器当前状态"""
+        return self.redis_client.circuit_breaker.state
     
     def is_available(self) -> bool:
         """检查Redis是否可用"""
         return self.available
     
+    def codec_for(self, key: str):
+        """
+        键对应的编解码器 - 键族（第一个":"及之前的部分）的候选前缀只解析一次，之后只在少量候选中按最长前缀匹配
+        """
+        family, colon, _ = key.partition(':')
+        if not colon:
+            candidates, default = self._resolve_codec_family(key)
+        else:
+            cache_key = (type(self), family + colon)
+            resolved = CacheService._codec_families.get(cache_key)
+            if resolved is None:
+                resolved = CacheService._codec_families[cache_key] = self._resolve_codec_family(family + colon)
+            candidates, default = resolved
+        
+        for prefix, codec in candidates:
+            if key.startswith(prefix):
+                return codec
+        return default
+    
+    def _resolve_codec_family(self, family: str) -> tuple:
+        """
+        解析键族可能匹配的前缀（按长度从长到短）及默认编解码器
+        """
+        codecs = {**self.KEY_CODECS, **getattr(settings, 'CACHE_KEY_CODECS', {})}
+        threshold = getattr(settings, 'CACHE_COMPRESS_THRESHOLD', 1024)
+        candidates = sorted(
+            ((prefix, get_codec(spec, threshold)) for prefix, spec in codecs.items()
+             if family.startswith(prefix) or prefix.startswith(family)),
+            key=lambda item: len(item[0]), reverse=True
+        )
+        return candidates, get_codec(getattr(settings, 'CACHE_DEFAULT_CODEC', 'json'), threshold)
+    
     def get(self, key: str, default=None) -> Any:
         """
-        获取缓存数据
+        获取缓存数据（读取原始字节后按键的编码解码，计数器直接转为整数）
         """
         try:
             if not self.available:
                 return default
             
-            value = self.redis_client.get(key)
+            value = self.redis_client.execute_command('GET', key, **{NEVER_DECODE: True})
             if value is None:
                 return default
-            
-            # 尝试解析JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return self.codec_for(key).decode(value)
         except Exception as e:
             logger.error(f"缓存获取失败 {key}: {e}")
             return default
     
     def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
         """
-        设置缓存数据
+        设置缓存数据（按键的编码序列化，超过阈值的压缩）
         """
         try:
             if not self.available:
                 return False
             
-            # 序列化数据
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
+            value = self.codec_for(key).encode(value)
             
             if timeout:
                 return self.redis_client.setex(key, timeout, value)
@@ -111,6 +335,44 @@ class CacheService:
         except Exception as e:
             logger.error(f"设置过期时间失败 {key}: {e}")
             return False
+    
+    def hgetall(self, key: str) -> Dict[str, str]:
+        """
+        获取哈希全部字段
+        """
+        try:
+            if not self.available:
+                return {}
+            return self.redis_client.hgetall(key)
+        except Exception as e:
+            logger.error(f"哈希获取失败 {key}: {e}")
+            return {}
+    
+    def hset(self, key: str, mapping: Dict[str, Any], timeout: Optional[int] = None) -> bool:
+        """
+        设置哈希字段
+        """
+        try:
+            if not self.available:
+                return False
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.hset(key, mapping=mapping)
+            if timeout:
+                pipe.expire(key, timeout)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"哈希设置失败 {key}: {e}")
+            return False
+
+
+@receiver(setting_changed)
+def _reset_codec_families(setting, **kwargs):
+    """
+    编码相关配置变更时（如测试中override_settings）清空已解析的键族编码
+    """
+    if setting in ('CACHE_KEY_CODECS', 'CACHE_DEFAULT_CODEC', 'CACHE_COMPRESS_THRESHOLD'):
+        CacheService._codec_families.clear()
 
 
 class ReadingCacheService(CacheService):
@@ -118,109 +380,1071 @@ class ReadingCacheService(CacheService):
     阅读统计专用缓存服务
     """
     
-    ARTICLE_STATS_KEY = "article_stats:{article_id}"
-    USER_READING_KEY = "user_reading:{article_id}:{user_id}"
-    IP_READING_KEY = "ip_reading:{article_id}:{ip}"
-    TOTAL_VIEWS_KEY = "total_views:{article_id}"
-    UNIQUE_USERS_KEY = "unique_users:{article_id}"
+    ARTICLE_COUNTERS_KEY = "article_counters:{article_id}"
+    UNIQUE_USERS_HLL_KEY = "article_uv:{article_id}:users"
+    UNIQUE_IPS_HLL_KEY = "article_uv:{article_id}:ips"
+    UNIQUE_SEEDED_KEY = "article_uv:{article_id}:seeded"
+    STATS_LEASE_KEY = "article_stats_lease:{article_id}"
+    # 用户/IP阅读次数：每篇文章按读者数分到若干小哈希（保持listpack编码），字段为二进制的用户ID或IP；
+    # 桶数记录在layout键中，键名里带桶数，桶数变化后旧桶不再写入、自然过期
+    READER_COUNTS_KEY = "reader_counts:{article_id}:{buckets}:{bucket}"
+    READER_LAYOUT_KEY = "reader_counts:{article_id}:layout"
+    LOCAL_READER_LAYOUT_KEY = "reader_layout:{article_id}"
+    # 旧布局（每个读者一个字符串键），只用于迁移
+    LEGACY_USER_READING_KEY = "user_reading:{article_id}:{user_id}"
+    LEGACY_IP_READING_KEY = "ip_reading:{article_id}:{ip}"
+    
+    # 阅读去重窗口：同一访客在窗口内对同一文章只计一次阅读
+    READING_DEDUP_KEY = "read_dedup:{article_id}:{visitor}"
+    
+    # 热门文章排行榜（有序集合）：总榜、日榜和按时间桶滚动合并的小时榜
+    LEADERBOARD_ALL_KEY = "article_rank:all"
+    LEADERBOARD_SEEDED_KEY = "article_rank:all:seeded"
+    LEADERBOARD_SEED_LEASE_KEY = "article_rank:all:lease"
+    LEADERBOARD_DAY_KEY = "article_rank:day:{date}"
+    LEADERBOARD_BUCKET_KEY = "article_rank:bucket:{bucket}"
+    LEADERBOARD_HOUR_KEY = "article_rank:hour"
+    LEADERBOARD_WINDOWS = ('all', 'day', 'hour')
+    LEADERBOARD_DAY_TTL = 2 * 24 * 3600
+    
+    # 按小时汇总的阅读量（hour为Unix时间戳整除3600），定期批量落库到ArticleViewRollup
+    ROLLUP_HOUR_KEY = "article_rollup:{hour}"
+    ROLLUP_VISITORS_KEY = "article_rollup:{hour}:{article_id}:uv"
+    ROLLUP_HOURS_KEY = "article_rollup:hours"
+    
+    # 一次阅读的全部计数更新，EVALSHA一次往返原子执行（阅读次数桶每次写入时续期，不会留下永不过期的键）；
+    # 采样增量只计入文章级汇总（计数器、排行榜、小时汇总），用户/IP阅读次数每次加1
+    # KEYS: 1计数器哈希 2用户HLL 3 IP HLL 4总榜 5日榜 6时间桶 7小时汇总 8小时访客HLL 9小时集合 10用户阅读次数桶 11 IP阅读次数桶
+    # ARGV: 1增量 2文章ID 3用户ID 4 IP 5访客标识 6小时 7日榜TTL 8时间桶TTL 9小时汇总TTL 10阅读次数TTL 11用户字段 12 IP字段
+    RECORD_VIEW_SCRIPT = """
+    local amount = tonumber(ARGV[1])
+    redis.call('HINCRBY', KEYS[1], 'total_views', amount)
+    local hydrated = redis.call('HEXISTS', KEYS[1], 'hydrated_at')
+    if ARGV[3] ~= '' then
+        redis.call('PFADD', KEYS[2], ARGV[3])
+        redis.call('HINCRBY', KEYS[10], ARGV[11], 1)
+        redis.call('EXPIRE', KEYS[10], ARGV[10])
+    end
+    if ARGV[4] ~= '' then
+        redis.call('PFADD', KEYS[3], ARGV[4])
+        redis.call('HINCRBY', KEYS[11], ARGV[12], 1)
+        redis.call('EXPIRE', KEYS[11], ARGV[10])
+    end
+    redis.call('ZINCRBY', KEYS[4], amount, ARGV[2])
+    redis.call('ZINCRBY', KEYS[5], amount, ARGV[2])
+    redis.call('EXPIRE', KEYS[5], ARGV[7])
+    redis.call('ZINCRBY', KEYS[6], amount, ARGV[2])
+    redis.call('EXPIRE', KEYS[6], ARGV[8])
+    redis.call('HINCRBY', KEYS[7], ARGV[2], amount)
+    redis.call('EXPIRE', KEYS[7], ARGV[9])
+    if ARGV[5] ~= '' then
+        redis.call('PFADD', KEYS[8], ARGV[5])
+        redis.call('EXPIRE', KEYS[8], ARGV[9])
+    end
+    redis.call('SADD', KEYS[9], ARGV[6])
+    return hydrated
+    """
+    _record_view_script = None
+    _scripting_supported = True
+    
+    # 写回模式下初始化/刷新计数器：数据库总量还不包含缓冲中的阅读，不能直接覆盖
+    # 未初始化时 = 数据库总量 + 初始化前已累加的增量；已初始化时取两者较大值
+    # KEYS: 1计数器哈希  ARGV: 1数据库总阅读量 2初始化时间 3逻辑TTL 4重算耗时 5键过期秒数
+    MERGE_COUNTERS_SCRIPT = """
+    local db_total = tonumber(ARGV[1])
+    local current = tonumber(redis.call('HGET', KEYS[1], 'total_views') or '0')
+    local total
+    if redis.call('HEXISTS', KEYS[1], 'hydrated_at') == 1 then
+        total = math.max(current, db_total)
+    else
+        total = db_total + current
+    end
+    redis.call('HSET', KEYS[1], 'total_views', total, 'hydrated_at', ARGV[2], 'ttl', ARGV[3], 'compute_time', ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return total
+    """
+    _merge_counters_script = None
+    
+    # 对账后用数据库总阅读量覆盖计数器（可以调低多计的值）；只覆盖已初始化的，
+    # 不会为未初始化或已过期的文章创建缺少hydrated_at的哈希
+    # KEYS: 1计数器哈希  ARGV: 1数据库总阅读量
+    RESET_COUNTERS_SCRIPT = """
+    if redis.call('HEXISTS', KEYS[1], 'hydrated_at') == 0 then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'total_views', ARGV[1])
+    return 1
+    """
+    _reset_counters_script = None
+    
+    # L1进程内缓存
+    LOCAL_STATS_KEY = "stats:{article_id}"
+    LOCAL_ARTICLE_KEY = "article:{article_id}"
+    L1_INVALIDATION_CHANNEL = "l1_invalidate"
+    _listener_pid = None
+    _listener_lock = threading.Lock()
+    
+    # 进程内累加的缓存请求统计 {stats_key: [total, hits, l1_hits]}
+    _pending_counts = {}
+    _pending_lock = threading.Lock()
+    _pending_pid = None
+    _pending_flushed_at = 0.0
+    
+    def get_article_stats(self, article_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取文章统计数据 - 总阅读量来自计数器哈希，独立用户/IP数来自HyperLogLog
+        
+        未命中时返回None；阅读量为0的文章也会缓存（负缓存），命中时返回全0的统计
+        """
+        stats, _ = self.get_article_stats_entry(article_id)
+        return stats
     
-    def get_article_stats(self, article_id: int) -> Dict[str, int]:
+    def get_article_stats_entry(self, article_id: int):
         """
-        获取文章统计数据
+        获取文章统计数据及是否需要刷新，返回(统计数据或None, 是否需要刷新)
         """
-        key = self.ARTICLE_STATS_KEY.format(article_id=article_id)
-        stats = self.get(key, {
-            'total_views': 0,
-            'unique_users': 0,
-            'unique_ips': 0
-        })
+        results, l1_hits, refresh_ids = self._fetch_article_stats([article_id])
         
-        # 记录缓存命中率
-        self._record_cache_request(key, stats != {})
+        stats = results.get(article_id)
         
-        return stats
+        # 记录缓存命中率（含L1命中数）
+        self._record_cache_requests(1, 1 if stats is not None else 0, l1_hits)
+        
+        return stats, article_id in refresh_ids
     
-    def update_article_stats(self, article_id: int, stats: Dict[str, int]) -> bool:
+    def peek_article_stats(self, article_id: int) -> Optional[Dict[str, Any]]:
         """
-        更新文章统计数据
+        读取文章统计数据，不计入命中率（等待其他进程初始化时轮询使用）
         """
-        key = self.ARTICLE_STATS_KEY.format(article_id=article_id)
-        timeout = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
-        return self.set(key, stats, timeout)
+        results, _, _ = self._fetch_article_stats([article_id])
+        return results.get(article_id)
     
-    def get_user_reading_count(self, article_id: int, user_id: int) -> int:
+    def get_many_article_stats(self, article_ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
         """
-        获取用户对文章的阅读次数
+        批量获取文章统计数据（一次管道往返），未命中的文章值为None
+        """
+        results, _ = self.get_many_article_stats_entries(article_ids)
+        return results
+    
+    def get_many_article_stats_entries(self, article_ids: List[int]):
+        """
+        批量获取文章统计数据及需要刷新的文章，返回({文章ID: 统计数据或None}, 需要刷新的文章ID集合)
         """
-        key = self.USER_READING_KEY.format(article_id=article_id, user_id=user_id)
-        count = self.get(key, 0)
+        if not article_ids:
+            return {}, set()
         
-        # 记录缓存命中率
-        self._record_cache_request(key, count != 0)
+        results, l1_hits, refresh_ids = self._fetch_article_stats(article_ids)
         
-        return count
+        # 记录缓存命中率（整批只记录一次）
+        self._record_cache_requests(len(article_ids), len(results), l1_hits)
+        
+        return {article_id: results.get(article_id) for article_id in article_ids}, refresh_ids
     
-    def incr_user_reading_count(self, article_id: int, user_id: int) -> int:
+    def _fetch_article_stats(self, article_ids: List[int]):
         """
-        增加用户阅读次数
+        先查L1缓存，其余文章通过一次管道读取计数器哈希和HyperLogLog
+        
+        返回(已初始化文章的统计数据, L1命中数, 需要提前刷新的文章ID集合)
         """
-        key = self.USER_READING_KEY.format(article_id=article_id, user_id=user_id)
-        count = self.incr(key)
+        results = {}
+        refresh_ids = set()
+        local_cache = get_local_cache()
+        for article_id in article_ids:
+            stats = local_cache.get(self.LOCAL_STATS_KEY.format(article_id=article_id))
+            if stats is not None:
+                results[article_id] = dict(stats)
+        l1_hits = len(results)
         
-        # 设置过期时间
-        if count == 1:
-            timeout = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
-            self.expire(key, timeout)
+        remote_ids = [article_id for article_id in article_ids if article_id not in results]
+        if not remote_ids:
+            return results, l1_hits, refresh_ids
         
-        return count
+        try:
+            if not self.available:
+                return results, l1_hits, refresh_ids
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id in remote_ids:
+                pipe.hgetall(self.ARTICLE_COUNTERS_KEY.format(article_id=article_id))
+                pipe.pfcount(self.UNIQUE_USERS_HLL_KEY.format(article_id=article_id))
+                pipe.pfcount(self.UNIQUE_IPS_HLL_KEY.format(article_id=article_id))
+            replies = pipe.execute()
+        except Exception as e:
+            logger.error(f"缓存批量获取失败 {remote_ids}: {e}")
+            return results, l1_hits, refresh_ids
+        
+        self.ensure_invalidation_listener()
+        stats_ttl = getattr(settings, 'L1_STATS_TTL', 5)
+        for index, article_id in enumerate(remote_ids):
+            counters, unique_users, unique_ips = replies[index * 3:index * 3 + 3]
+            # hydrated_at是初始化标记：没有该字段说明计数器不存在或尚未初始化，
+            # 有该字段时即使total_views为0也是有效的缓存
+            if 'hydrated_at' not in counters:
+                continue
+            if self._refresh_due(
+                float(counters['hydrated_at']),
+                float(counters.get('ttl', getattr(settings, 'READING_STATS_CACHE_TTL', 3600))),
+                float(counters.get('compute_time', 0))
+            ):
+                refresh_ids.add(article_id)
+            results[article_id] = {
+                'total_views': int(counters.get('total_views', 0)),
+                'unique_users': unique_users,
+                'unique_ips': unique_ips,
+                'approximate': True
+            }
+            local_cache.set(self.LOCAL_STATS_KEY.format(article_id=article_id), results[article_id], stats_ttl)
+        
+        return results, l1_hits, refresh_ids
     
-    def get_ip_reading_count(self, article_id: int, ip_address: str) -> int:
+    def _refresh_due(self, hydrated_at: float, ttl: float, compute_time: float) -> bool:
         """
-        获取IP对文章的阅读次数
+        XFetch概率提前刷新：越接近过期、重算耗时越长，越可能提前刷新
+        
+        过期时间之后一定需要刷新，此时计数器仍在宽限期内，可作为旧值继续返回
+        """
+        expires_at = hydrated_at + ttl
+        beta = getattr(settings, 'READING_STATS_XFETCH_BETA', 1.0)
+        return time.time() - compute_time * beta * math.log(1.0 - random.random()) >= expires_at
+    
+    def acquire_refresh_lease(self, article_id: int) -> bool:
+        """
+        获取统计重算租约，同一时间只有一个进程从数据库重算同一篇文章
+        
+        Redis不可用时返回True，由调用方直接访问数据库
+        """
+        return article_id in self.acquire_refresh_leases([article_id])
+    
+    def acquire_refresh_leases(self, article_ids: List[int]) -> set:
+        """
+        批量获取统计重算租约（一次管道往返），返回获取成功的文章ID集合
+        """
+        try:
+            if not self.available or not article_ids:
+                return set(article_ids)
+            lease_ttl = getattr(settings, 'READING_STATS_LEASE_TTL', 10)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.set(self.STATS_LEASE_KEY.format(article_id=article_id), 1, nx=True, ex=lease_ttl)
+            return {
+                article_id for article_id, acquired in zip(article_ids, pipe.execute()) if acquired
+            }
+        except Exception as e:
+            logger.error(f"获取统计重算租约失败 {article_ids}: {e}")
+            return set(article_ids)
+    
+    def release_refresh_leases(self, article_ids: List[int]):
+        """
+        释放统计重算租约
+        """
+        try:
+            if self.available and article_ids:
+                self.redis_client.delete(
+                    *[self.STATS_LEASE_KEY.format(article_id=article_id) for article_id in article_ids]
+                )
+        except Exception as e:
+            logger.error(f"释放统计重算租约失败 {article_ids}: {e}")
+    
+    def get_local(self, key: str, default=None) -> Any:
+        """
+        读取L1缓存
+        """
+        return get_local_cache().get(key, default)
+    
+    def set_local(self, key: str, value: Any, timeout: float) -> bool:
+        """
+        写入L1缓存（确保本进程已订阅失效通知）
+        """
+        self.ensure_invalidation_listener()
+        return get_local_cache().set(key, value, timeout)
+    
+    def invalidate_article(self, article_id: int):
+        """
+        文章变更时清除本进程L1缓存，并通过pub/sub通知其他进程
+        """
+        self._evict_local_article(article_id)
+        try:
+            if self.available:
+                self.redis_client.publish(self.L1_INVALIDATION_CHANNEL, str(article_id))
+        except Exception as e:
+            logger.error(f"发布L1缓存失效通知失败 {article_id}: {e}")
+    
+    def _evict_local_article(self, article_id: int):
+        local_cache = get_local_cache()
+        local_cache.delete(self.LOCAL_ARTICLE_KEY.format(article_id=article_id))
+        local_cache.delete(self.LOCAL_STATS_KEY.format(article_id=article_id))
+    
+    def ensure_invalidation_listener(self):
+        """
+        按需启动本进程的L1失效订阅线程（fork后在子进程中重新启动）
+        """
+        cls = ReadingCacheService
+        if cls._listener_pid == os.getpid():
+            return
+        with cls._listener_lock:
+            if cls._listener_pid != os.getpid():
+                L1InvalidationListener(self.L1_INVALIDATION_CHANNEL, self._evict_local_article).start()
+                cls._listener_pid = os.getpid()
+    
+    def update_article_stats(self, article_id: int, stats: Dict[str, int], compute_time: float = 0.0,
+                             merge: bool = False) -> bool:
+        """
+        用数据库统计初始化文章计数器（冷启动或刷新时调用）
+        """
+        return self.update_many_article_stats({article_id: stats}, compute_time, merge)
+    
+    def update_many_article_stats(self, stats_map: Dict[int, Dict[str, int]], compute_time: float = 0.0,
+                                  merge: bool = False) -> bool:
+        """
+        批量初始化文章计数器（一次管道往返）
+        
+        compute_time为本次从数据库重算的耗时，用于XFetch提前刷新；
+        阅读量为0的文章使用较短的READING_STATS_NEGATIVE_TTL（负缓存）；
+        计数器在逻辑过期后再保留READING_STATS_STALE_TTL秒，刷新期间其他请求读取旧值；
+        merge=True（写回模式，数据库总量落后于Redis）时用MERGE_COUNTERS_SCRIPT合并而不是覆盖
+        """
+        try:
+            if not self.available or not stats_map:
+                return False
+            stale_ttl = getattr(settings, 'READING_STATS_STALE_TTL', 300)
+            hydrated_at = time.time()
+            local_cache = get_local_cache()
+            merge = merge and ReadingCacheService._scripting_supported
+            if merge and ReadingCacheService._merge_counters_script is None:
+                ReadingCacheService._merge_counters_script = self.redis_client.register_script(
+                    self.MERGE_COUNTERS_SCRIPT
+                )
+            pipe = self.redis_client.pipeline(transaction=True)
+            for article_id, stats in stats_map.items():
+                key = self.ARTICLE_COUNTERS_KEY.format(article_id=article_id)
+                total_views = stats.get('total_views', 0)
+                if total_views:
+                    ttl = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
+                else:
+                    ttl = getattr(settings, 'READING_STATS_NEGATIVE_TTL', 60)
+                local_cache.delete(self.LOCAL_STATS_KEY.format(article_id=article_id))
+                if merge:
+                    self._merge_counters_script(
+                        keys=[key], args=[total_views, hydrated_at, ttl, compute_time, ttl + stale_ttl], client=pipe
+                    )
+                    continue
+                pipe.hset(key, mapping={
+                    'total_views': total_views,
+                    'hydrated_at': hydrated_at,
+                    'ttl': ttl,
+                    'compute_time': compute_time
+                })
+                pipe.expire(key, ttl + stale_ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"文章计数器初始化失败 {list(stats_map)}: {e}")
+            return False
+    
+    def reset_article_totals(self, totals: Dict[int, int]) -> int:
+        """
+        对账后用数据库总阅读量覆盖已初始化的文章计数器（一次管道往返），返回覆盖的文章数
+        
+        服务器不支持脚本时删除计数器，由下次读取重新初始化
+        """
+        if not totals:
+            return 0
+        try:
+            if not self.available:
+                return 0
+            if ReadingCacheService._scripting_supported and ReadingCacheService._reset_counters_script is None:
+                ReadingCacheService._reset_counters_script = self.redis_client.register_script(
+                    self.RESET_COUNTERS_SCRIPT
+                )
+            local_cache = get_local_cache()
+            pipe = self.redis_client.pipeline(transaction=True)
+            for article_id, total_views in totals.items():
+                key = self.ARTICLE_COUNTERS_KEY.format(article_id=article_id)
+                local_cache.delete(self.LOCAL_STATS_KEY.format(article_id=article_id))
+                if ReadingCacheService._scripting_supported:
+                    self._reset_counters_script(keys=[key], args=[total_views], client=pipe)
+                else:
+                    pipe.delete(key)
+            return sum(pipe.execute())
+        except Exception as e:
+            logger.error(f"文章计数器覆盖失败 {list(totals)}: {e}")
+            return 0
+    
+    @staticmethod
+    def reading_visitor(user_id: int = None, ip_address: str = None) -> str:
+        """
+        访客标识：登录用户按用户ID，匿名访问按IP
+        """
+        return f"u{user_id}" if user_id else f"ip{ip_address}"
+    
+    def claim_reading_window(self, article_id: int, user_id: int = None,
+                             ip_address: str = None, window: int = 1800) -> Optional[bool]:
+        """
+        占用访客对文章的去重窗口（SET NX EX），返回是否为窗口内首次阅读
+        
+        Redis不可用时返回None，由调用方降级
+        """
+        key = self.READING_DEDUP_KEY.format(
+            article_id=article_id, visitor=self.reading_visitor(user_id, ip_address)
+        )
+        try:
+            if not self.available:
+                return None
+            return bool(self.redis_client.set(key, 1, nx=True, ex=window))
+        except Exception as e:
+            logger.error(f"阅读去重窗口检查失败 {key}: {e}")
+            return None
+    
+    def record_article_view(self, article_id: int, user_id: int = None,
+                            ip_address: str = None, amount: int = 1) -> bool:
+        """
+        一次往返完成一次阅读的全部计数：总阅读量、独立用户/IP、用户/IP阅读次数、排行榜和小时汇总，
+        返回计数器是否已初始化；采样增量amount不计入用户/IP阅读次数
+        
+        优先执行注册的Lua脚本（EVALSHA），服务器不支持脚本时改用MULTI管道；
+        计数器未初始化（冷启动或已过期）时返回False，由调用方从数据库初始化
+        """
+        key = self.ARTICLE_COUNTERS_KEY.format(article_id=article_id)
+        get_local_cache().delete(self.LOCAL_STATS_KEY.format(article_id=article_id))
+        try:
+            if not self.available:
+                return False
+            if ReadingCacheService._scripting_supported:
+                try:
+                    return self._record_article_view_script(article_id, user_id, ip_address, amount)
+                except redis.ResponseError as e:
+                    if 'unknown command' not in str(e).lower():
+                        raise
+                    logger.warning(f"Redis不支持Lua脚本，阅读计数改用管道: {e}")
+                    ReadingCacheService._scripting_supported = False
+            return self._record_article_view_pipeline(article_id, user_id, ip_address, amount)
+        except Exception as e:
+            logger.error(f"文章阅读量递增失败 {key}: {e}")
+            return False
+    
+    def _record_article_view_script(self, article_id: int, user_id: int, ip_address: str, amount: int) -> bool:
+        """
+        通过Lua脚本原子更新一次阅读的全部计数
+        """
+        if ReadingCacheService._record_view_script is None:
+            ReadingCacheService._record_view_script = self.redis_client.register_script(self.RECORD_VIEW_SCRIPT)
+        
+        day_key, bucket_key, bucket_ttl = self._leaderboard_keys()
+        hour, hour_key, visitors_key, visitor, retention = self._rollup_keys(article_id, user_id, ip_address)
+        buckets = self.reader_buckets(article_id)
+        user_field = self.reader_field(user_id=user_id) if user_id else b''
+        ip_field = self.reader_field(ip_address=ip_address) if ip_address else b''
+        keys = [
+            self.ARTICLE_COUNTERS_KEY.format(article_id=article_id),
+            self.UNIQUE_USERS_HLL_KEY.format(article_id=article_id),
+            self.UNIQUE_IPS_HLL_KEY.format(article_id=article_id),
+            self.LEADERBOARD_ALL_KEY,
+            day_key,
+            bucket_key,
+            hour_key,
+            visitors_key,
+            self.ROLLUP_HOURS_KEY,
+            self.reader_counts_key(article_id, user_field, buckets) if user_field else '',
+            self.reader_counts_key(article_id, ip_field, buckets) if ip_field else '',
+        ]
+        args = [
+            amount, article_id, user_id or '', ip_address or '', visitor or '', hour,
+            self.LEADERBOARD_DAY_TTL, bucket_ttl, retention,
+            getattr(settings, 'READING_STATS_CACHE_TTL', 3600), user_field, ip_field,
+        ]
+        return bool(self._record_view_script(keys=keys, args=args, client=self.redis_client))
+    
+    def _record_article_view_pipeline(self, article_id: int, user_id: int, ip_address: str, amount: int) -> bool:
+        """
+        不支持脚本时的降级：MULTI管道更新全部计数，与脚本一样每次写入时为阅读次数桶续期
+        """
+        buckets = self.reader_buckets(article_id)
+        reader_ttl = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hincrby(self.ARTICLE_COUNTERS_KEY.format(article_id=article_id), 'total_views', amount)
+        pipe.hexists(self.ARTICLE_COUNTERS_KEY.format(article_id=article_id), 'hydrated_at')
+        reader_fields = []
+        if user_id:
+            pipe.pfadd(self.UNIQUE_USERS_HLL_KEY.format(article_id=article_id), user_id)
+            reader_fields.append(self.reader_field(user_id=user_id))
+        if ip_address:
+            pipe.pfadd(self.UNIQUE_IPS_HLL_KEY.format(article_id=article_id), ip_address)
+            reader_fields.append(self.reader_field(ip_address=ip_address))
+        for field in reader_fields:
+            reader_key = self.reader_counts_key(article_id, field, buckets)
+            pipe.hincrby(reader_key, field, 1)
+            pipe.expire(reader_key, reader_ttl)
+        self._add_leaderboard_views(pipe, article_id, amount)
+        self._add_rollup_view(pipe, article_id, user_id, ip_address, amount)
+        results = pipe.execute()
+        return bool(results[1])
+    
+    def _leaderboard_keys(self) -> tuple:
+        """
+        当前的日榜键、时间桶键及时间桶的过期秒数
+        """
+        bucket_seconds = getattr(settings, 'LEADERBOARD_BUCKET_SECONDS', 300)
+        day_key = self._leaderboard_day_key()
+        bucket_key = self.LEADERBOARD_BUCKET_KEY.format(bucket=int(time.time() // bucket_seconds))
+        return day_key, bucket_key, 3600 + bucket_seconds
+    
+    def _leaderboard_day_key(self) -> str:
+        """
+        当日的日榜键（按TIME_ZONE的本地日期，与小时汇总的按天统计一致）
+        """
+        return self.LEADERBOARD_DAY_KEY.format(date=timezone.localdate().strftime('%Y%m%d'))
+    
+    def _add_leaderboard_views(self, pipe, article_id: int, amount: int):
+        """
+        在同一管道内递增总榜、日榜和当前时间桶的分数
+        """
+        day_key, bucket_key, bucket_ttl = self._leaderboard_keys()
+        pipe.zincrby(self.LEADERBOARD_ALL_KEY, amount, article_id)
+        pipe.zincrby(day_key, amount, article_id)
+        pipe.expire(day_key, self.LEADERBOARD_DAY_TTL)
+        pipe.zincrby(bucket_key, amount, article_id)
+        pipe.expire(bucket_key, bucket_ttl)
+    
+    def _rollup_keys(self, article_id: int, user_id: int, ip_address: str) -> tuple:
+        """
+        当前小时、小时汇总键、小时访客键、访客标识（登录用户按用户ID，匿名按IP）及保留秒数
+        """
+        hour = int(time.time() // 3600)
+        retention = getattr(settings, 'VIEW_ROLLUP_RETENTION_HOURS', 48) * 3600
+        visitor = f'u:{user_id}' if user_id else (f'ip:{ip_address}' if ip_address else None)
+        return (
+            hour,
+            self.ROLLUP_HOUR_KEY.format(hour=hour),
+            self.ROLLUP_VISITORS_KEY.format(hour=hour, article_id=article_id),
+            visitor,
+            retention
+        )
+    
+    def _add_rollup_view(self, pipe, article_id: int, user_id: int, ip_address: str, amount: int):
+        """
+        在同一管道内累加当前小时的阅读量和独立访客
+        """
+        hour, hour_key, visitors_key, visitor, retention = self._rollup_keys(article_id, user_id, ip_address)
+        pipe.hincrby(hour_key, article_id, amount)
+        pipe.expire(hour_key, retention)
+        if visitor:
+            pipe.pfadd(visitors_key, visitor)
+            pipe.expire(visitors_key, retention)
+        pipe.sadd(self.ROLLUP_HOURS_KEY, hour)
+    
+    def get_rollup_hours(self) -> List[int]:
+        """
+        返回Redis中尚未清理的小时
+        """
+        try:
+            if not self.available:
+                return []
+            return sorted(int(hour) for hour in self.redis_client.smembers(self.ROLLUP_HOURS_KEY))
+        except Exception as e:
+            logger.error(f"获取待落库小时失败: {e}")
+            return []
+    
+    def get_rollup_counts(self, hour: int, article_id: int = None) -> Dict[int, tuple]:
+        """
+        读取某小时的累计阅读量和独立访客数{文章ID: (阅读量, 独立访客数)}，可只读一篇文章
+        """
+        try:
+            if not self.available:
+                return {}
+            hour_key = self.ROLLUP_HOUR_KEY.format(hour=hour)
+            if article_id is None:
+                views = {int(key): int(value) for key, value in self.redis_client.hgetall(hour_key).items()}
+            else:
+                value = self.redis_client.hget(hour_key, article_id)
+                views = {article_id: int(value)} if value else {}
+            if not views:
+                return {}
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in views:
+                pipe.pfcount(self.ROLLUP_VISITORS_KEY.format(hour=hour, article_id=key))
+            return {
+                key: (count, visitors) for (key, count), visitors in zip(views.items(), pipe.execute())
+            }
+        except Exception as e:
+            logger.error(f"读取小时阅读量失败 {hour}: {e}")
+            return {}
+    
+    def get_many_rollup_counts(self, hours: List[int], article_id: int) -> Dict[int, tuple]:
+        """
+        一次管道读取一篇文章在多个小时的累计阅读量和独立访客数{小时: (阅读量, 独立访客数)}
+        """
+        try:
+            if not self.available or not hours:
+                return {}
+            pipe = self.redis_client.pipeline(transaction=False)
+            for hour in hours:
+                pipe.hget(self.ROLLUP_HOUR_KEY.format(hour=hour), article_id)
+                pipe.pfcount(self.ROLLUP_VISITORS_KEY.format(hour=hour, article_id=article_id))
+            results = pipe.execute()
+            return {
+                hour: (int(results[i * 2]), results[i * 2 + 1])
+                for i, hour in enumerate(hours) if results[i * 2]
+            }
+        except Exception as e:
+            logger.error(f"读取文章小时阅读量失败 {article_id}: {e}")
+            return {}
+    
+    def clear_rollup_hour(self, hour: int, article_ids: Iterable) -> bool:
+        """
+        已落库且不会再写入的小时，删除其Redis数据
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(self.ROLLUP_HOUR_KEY.format(hour=hour))
+            for article_id in article_ids:
+                pipe.delete(self.ROLLUP_VISITORS_KEY.format(hour=hour, article_id=article_id))
+            pipe.srem(self.ROLLUP_HOURS_KEY, hour)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"清理小时阅读量失败 {hour}: {e}")
+            return False
+    
+    def get_leaderboard(self, window: str, n: int) -> Optional[List[tuple]]:
+        """
+        获取排行榜前n名[(文章ID, 阅读量)]，Redis不可用或总榜未初始化时返回None
+        
+        小时榜由最近一小时的时间桶合并而成，合并结果缓存LEADERBOARD_HOUR_REFRESH秒，
+        期间的请求只需一次ZREVRANGE
+        """
+        try:
+            if not self.available:
+                return None
+            
+            if window == 'all':
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.exists(self.LEADERBOARD_SEEDED_KEY)
+                pipe.zrevrange(self.LEADERBOARD_ALL_KEY, 0, n - 1, withscores=True)
+                seeded, ranking = pipe.execute()
+                if not seeded:
+                    return None
+            elif window == 'day':
+                ranking = self.redis_client.zrevrange(self._leaderboard_day_key(), 0, n - 1, withscores=True)
+            else:
+                ranking = self._get_hour_leaderboard(n)
+            
+            return [(int(article_id), int(score)) for article_id, score in ranking]
+        except Exception as e:
+            logger.error(f"获取排行榜失败 {window}: {e}")
+            return None
+    
+    def _get_hour_leaderboard(self, n: int) -> list:
+        """
+        读取小时榜，合并结果过期时重新合并最近一小时的时间桶
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.exists(self.LEADERBOARD_HOUR_KEY)
+        pipe.zrevrange(self.LEADERBOARD_HOUR_KEY, 0, n - 1, withscores=True)
+        exists, ranking = pipe.execute()
+        if exists:
+            return ranking
+        
+        bucket_seconds = getattr(settings, 'LEADERBOARD_BUCKET_SECONDS', 300)
+        current = int(time.time() // bucket_seconds)
+        bucket_keys = [
+            self.LEADERBOARD_BUCKET_KEY.format(bucket=bucket)
+            for bucket in range(current - math.ceil(3600 / bucket_seconds) + 1, current + 1)
+        ]
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.zunionstore(self.LEADERBOARD_HOUR_KEY, bucket_keys)
+        pipe.expire(self.LEADERBOARD_HOUR_KEY, getattr(settings, 'LEADERBOARD_HOUR_REFRESH', 10))
+        pipe.zrevrange(self.LEADERBOARD_HOUR_KEY, 0, n - 1, withscores=True)
+        return pipe.execute()[-1]
+    
+    def acquire_leaderboard_seed_lease(self) -> bool:
+        """
+        获取总榜初始化租约，同时只有一个请求从数据库初始化
+        """
+        try:
+            return bool(self.redis_client.set(
+                self.LEADERBOARD_SEED_LEASE_KEY, 1, nx=True,
+                ex=getattr(settings, 'READING_STATS_LEASE_TTL', 10)
+            ))
+        except Exception as e:
+            logger.error(f"获取排行榜初始化租约失败: {e}")
+            return False
+    
+    def seed_leaderboard(self, scores: Iterable, chunk_size: int = 1000) -> bool:
+        """
+        用数据库中的总阅读量初始化总榜，scores为(文章ID, 阅读量)
+        """
+        try:
+            chunk = {}
+            for article_id, total_views in scores:
+                chunk[article_id] = total_views
+                if len(chunk) >= chunk_size:
+                    self.redis_client.zadd(self.LEADERBOARD_ALL_KEY, chunk)
+                    chunk = {}
+            if chunk:
+                self.redis_client.zadd(self.LEADERBOARD_ALL_KEY, chunk)
+            self.redis_client.set(self.LEADERBOARD_SEEDED_KEY, 1)
+            return True
+        except Exception as e:
+            logger.error(f"排行榜初始化失败: {e}")
+            return False
+        finally:
+            try:
+                self.redis_client.delete(self.LEADERBOARD_SEED_LEASE_KEY)
+            except Exception:
+                pass
+    
+    def remove_from_leaderboards(self, article_id: int) -> bool:
+        """
+        从总榜和日榜移除文章（删除或取消发布时调用，时间桶很快过期）
+        """
+        try:
+            if not self.available:
+                return False
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in (self.LEADERBOARD_ALL_KEY, self._leaderboard_day_key(), self.LEADERBOARD_HOUR_KEY):
+                pipe.zrem(key, article_id)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"排行榜移除文章失败 {article_id}: {e}")
+            return False
+    
+    def restore_to_leaderboard(self, article_id: int, total_views: int) -> bool:
+        """
+        重新发布的文章按总阅读量放回总榜（ZADD NX，已在榜上的分数不覆盖）；
+        日榜和小时榜只统计之后的阅读
+        """
+        try:
+            if not self.available:
+                return False
+            self.redis_client.zadd(self.LEADERBOARD_ALL_KEY, {article_id: total_views}, nx=True)
+            return True
+        except Exception as e:
+            logger.error(f"排行榜恢复文章失败 {article_id}: {e}")
+            return False
+    
+    def has_unique_sketch(self, article_id: int) -> bool:
+        """
+        独立用户/IP基数草图是否已从数据库初始化
+        """
+        return article_id in self.get_seeded_articles([article_id])
+    
+    def get_seeded_articles(self, article_ids: List[int]) -> set:
+        """
+        返回基数草图已初始化的文章ID集合（一次管道往返）
+        """
+        try:
+            if not self.available:
+                return set()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.exists(self.UNIQUE_SEEDED_KEY.format(article_id=article_id))
+            return {
+                article_id for article_id, seeded in zip(article_ids, pipe.execute()) if seeded
+            }
+        except Exception as e:
+            logger.error(f"检查基数草图失败 {article_ids}: {e}")
+            return set()
+    
+    def seed_unique_readers(self, article_id: int, user_ids: Iterable, ip_addresses: Iterable,
+                            chunk_size: int = 1000) -> bool:
+        """
+        用数据库中已有的用户/IP初始化基数草图（每篇文章只需一次）
+        """
+        try:
+            if not self.available:
+                return False
+            
+            for hll_key, values in (
+                (self.UNIQUE_USERS_HLL_KEY.format(article_id=article_id), user_ids),
+                (self.UNIQUE_IPS_HLL_KEY.format(article_id=article_id), ip_addresses),
+            ):
+                chunk = []
+                for value in values:
+                    chunk.append(value)
+                    if len(chunk) >= chunk_size:
+                        self.redis_client.pfadd(hll_key, *chunk)
+                        chunk = []
+                if chunk:
+                    self.redis_client.pfadd(hll_key, *chunk)
+            
+            self.redis_client.set(self.UNIQUE_SEEDED_KEY.format(article_id=article_id), 1)
+            return True
+        except Exception as e:
+            logger.error(f"基数草图初始化失败 {article_id}: {e}")
+            return False
+    
+    @staticmethod
+    def reader_field(user_id: int = None, ip_address: str = None) -> bytes:
+        """
+        读者在计数哈希中的字段：b'u'+用户ID，b'4'/b'6'+打包的IPv4/IPv6地址（IPv4映射的IPv6按IPv4存）
+        """
+        if user_id:
+            return b'u' + int(user_id).to_bytes(8, 'big').lstrip(b'\0')
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return b'i' + str(ip_address).encode('utf-8')
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        return (b'4' if ip.version == 4 else b'6') + ip.packed
+    
+    def reader_counts_key(self, article_id: int, field: bytes, buckets: int) -> str:
+        """
+        读者字段所在的计数哈希（按字段的CRC32分到文章的buckets个桶）
+        """
+        return self.READER_COUNTS_KEY.format(article_id=article_id, buckets=buckets,
+                                             bucket=zlib.crc32(field) % buckets)
+    
+    def reader_buckets(self, article_id: int, create: bool = True) -> int:
         """
-        key = self.IP_READING_KEY.format(article_id=article_id, ip=ip_address.replace('.', '_'))
-        count = self.get(key, 0)
+        文章阅读次数的分桶数，create=False且还没有记录时返回0
+        
+        首次写入时按独立用户+IP数（HyperLogLog）预留一倍余量，取2的幂，使每个桶的字段数不超过
+        READER_COUNTS_FIELDS_PER_BUCKET（应低于Redis的hash-max-listpack-entries，默认128，超过后哈希
+        转为hashtable编码，小哈希省下的内存随之消失）；记录在layout键中，过期后按当时的读者数重新确定
+        """
+        local_key = self.LOCAL_READER_LAYOUT_KEY.format(article_id=article_id)
+        local_cache = get_local_cache()
+        buckets = local_cache.get(local_key)
+        if buckets is not None:
+            return buckets
+        
+        layout_key = self.READER_LAYOUT_KEY.format(article_id=article_id)
+        buckets = self.redis_client.get(layout_key)
+        if buckets is None:
+            if not create:
+                return 0
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.pfcount(self.UNIQUE_USERS_HLL_KEY.format(article_id=article_id))
+            pipe.pfcount(self.UNIQUE_IPS_HLL_KEY.format(article_id=article_id))
+            readers = sum(pipe.execute())
+            per_bucket = getattr(settings, 'READER_COUNTS_FIELDS_PER_BUCKET', 64)
+            max_buckets = getattr(settings, 'READER_COUNTS_MAX_BUCKETS', 1024)
+            buckets = 1
+            while buckets * per_bucket < readers * 2 and buckets < max_buckets:
+                buckets *= 2
+            # 并发初始化时以先写入的为准；layout比阅读次数桶多保留一个TTL，桶续期期间布局不变
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.set(layout_key, buckets, nx=True, ex=2 * getattr(settings, 'READING_STATS_CACHE_TTL', 3600))
+            pipe.get(layout_key)
+            buckets = pipe.execute()[1] or buckets
+        
+        buckets = int(buckets)
+        local_cache.set(local_key, buckets, getattr(settings, 'L1_STATS_TTL', 5))
+        return buckets
+    
+    def get_reader_count(self, article_id: int, user_id: int = None, ip_address: str = None) -> int:
+        """
+        获取用户或IP对文章的阅读次数
+        """
+        field = self.reader_field(user_id=user_id, ip_address=ip_address)
+        key = self.READER_LAYOUT_KEY.format(article_id=article_id)
+        try:
+            count = 0
+            buckets = self.reader_buckets(article_id, create=False) if self.available else 0
+            if buckets:
+                key = self.reader_counts_key(article_id, field, buckets)
+                count = int(self.redis_client.hget(key, field) or 0)
+        except Exception as e:
+            logger.error(f"获取阅读次数失败 {key}: {e}")
+            count = 0
         
         # 记录缓存命中率
         self._record_cache_request(key, count != 0)
         
         return count
     
-    def incr_ip_reading_count(self, article_id: int, ip_address: str) -> int:
+    def incr_reader_count(self, article_id: int, user_id: int = None,
+                          ip_address: str = None, amount: int = 1) -> int:
+        """
+        增加用户或IP对文章的阅读次数（阅读时由record_article_view统一递增）
+        """
+        field = self.reader_field(user_id=user_id, ip_address=ip_address)
+        key = self.READER_LAYOUT_KEY.format(article_id=article_id)
+        try:
+            if not self.available:
+                return 0
+            key = self.reader_counts_key(article_id, field, self.reader_buckets(article_id))
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.hincrby(key, field, amount)
+            pipe.expire(key, getattr(settings, 'READING_STATS_CACHE_TTL', 3600))
+            return pipe.execute()[0]
+        except Exception as e:
+            logger.error(f"阅读次数递增失败 {key}: {e}")
+            return 0
+    
+    def get_user_reading_count(self, article_id: int, user_id: int) -> int:
+        """
+        获取用户对文章的阅读次数
+        """
+        return self.get_reader_count(article_id, user_id=user_id)
+    
+    def incr_user_reading_count(self, article_id: int, user_id: int, amount: int = 1) -> int:
+        """
+        增加用户阅读次数
+        """
+        return self.incr_reader_count(article_id, user_id=user_id, amount=amount)
+    
+    def get_ip_reading_count(self, article_id: int, ip_address: str) -> int:
+        """
+        获取IP对文章的阅读次数
+        """
+        return self.get_reader_count(article_id, ip_address=ip_address)
+    
+    def incr_ip_reading_count(self, article_id: int, ip_address: str, amount: int = 1) -> int:
         """
         增加IP阅读次数
         """
-        key = self.IP_READING_KEY.format(article_id=article_id, ip=ip_address.replace('.', '_'))
-        count = self.incr(key)
+        return self.incr_reader_count(article_id, ip_address=ip_address, amount=amount)
+    
+    def migrate_legacy_reader_counts(self, batch_size: int = 1000) -> int:
+        """
+        把旧布局的user_reading/ip_reading字符串键合并进分桶哈希并删除，返回迁移的键数
         
-        # 设置过期时间
-        if count == 1:
-            timeout = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
-            self.expire(key, timeout)
+        可重复执行；桶的TTL只延长不缩短（同一批进入同一个桶的键取最长的剩余TTL），不会让已有的计数提前过期
+        """
+        if not self.available:
+            return 0
+        default_ttl = getattr(settings, 'READING_STATS_CACHE_TTL', 3600)
+        migrated = 0
+        patterns = (
+            self.LEGACY_USER_READING_KEY.format(article_id='*', user_id='*'),
+            self.LEGACY_IP_READING_KEY.format(article_id='*', ip='*'),
+        )
+        for pattern in patterns:
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    migrated += self._migrate_reader_count_batch(batch, default_ttl)
+                    batch = []
+            if batch:
+                migrated += self._migrate_reader_count_batch(batch, default_ttl)
+        return migrated
+    
+    def _migrate_reader_count_batch(self, keys: List[str], default_ttl: int) -> int:
+        """
+        迁移一批旧键：一次管道读取值和TTL，一次管道写入分桶哈希并删除旧键
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        results = pipe.execute()
         
-        return count
+        increments = {}
+        ttls = {}
+        for index, key in enumerate(keys):
+            value, ttl = results[2 * index], results[2 * index + 1]
+            kind, article_id, reader = key.split(':', 2)
+            if value is None or not article_id.isdigit():
+                continue
+            if kind == 'user_reading':
+                if not reader.isdigit():
+                    continue
+                field = self.reader_field(user_id=int(reader))
+            else:
+                # 旧布局把IPv4中的"."替换成了"_"
+                field = self.reader_field(ip_address=reader.replace('_', '.'))
+            bucket_key = self.reader_counts_key(int(article_id), field, self.reader_buckets(int(article_id)))
+            increments[(bucket_key, field)] = increments.get((bucket_key, field), 0) + int(value)
+            ttls[bucket_key] = max(ttls.get(bucket_key, 0), ttl if ttl > 0 else default_ttl)
+        
+        # 只在桶没有TTL或剩余TTL更短时设置（相当于EXPIRE GT，兼容Redis 7以下）
+        bucket_keys = list(ttls)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for bucket_key in bucket_keys:
+            pipe.ttl(bucket_key)
+        current_ttls = pipe.execute()
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (bucket_key, field), amount in increments.items():
+            pipe.hincrby(bucket_key, field, amount)
+        for bucket_key, current_ttl in zip(bucket_keys, current_ttls):
+            if current_ttl < ttls[bucket_key]:
+                pipe.expire(bucket_key, ttls[bucket_key])
+        pipe.delete(*keys)
+        pipe.execute()
+        return len(keys)
     
     def _record_cache_request(self, key: str, is_hit: bool):
         """
         记录缓存请求统计
         """
+        self._record_cache_requests(1, 1 if is_hit else 0)
+    
+    def _record_cache_requests(self, total: int, hits: int, l1_hits: int = 0):
+        """
+        按数量记录缓存请求统计（批量读取时整批记录一次），命中数包含L1命中
+        
+        CACHE_STATS_FLUSH_INTERVAL大于0时先在进程内累加，按间隔批量写入Redis
+        """
         try:
             now = datetime.now()
-            stats_key = f"cache_stats:{now.date()}:{now.hour}"
+            stats_key = (str(now.date()), now.hour)
             
-            # 总请求数
-            self.incr(f"{stats_key}:total")
+            interval = getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 0)
+            if interval <= 0:
+                self._flush_cache_request_counts({stats_key: [total, hits, l1_hits]})
+                return
             
-            # 命中数
-            if is_hit:
-                self.incr(f"{stats_key}:hits")
+            with self._pending_lock:
+                cls = ReadingCacheService
+                if cls._pending_pid != os.getpid():
+                    # fork后丢弃从父进程继承的未写入计数，避免重复统计
+                    cls._pending_counts = {}
+                    cls._pending_pid = os.getpid()
+                    cls._pending_flushed_at = time.monotonic()
+                    atexit.register(self.flush_cache_request_counts)
+                counts = cls._pending_counts.setdefault(stats_key, [0, 0, 0])
+                counts[0] += total
+                counts[1] += hits
+                counts[2] += l1_hits
+                
+                if time.monotonic() - cls._pending_flushed_at < interval:
+                    return
+                pending = cls._pending_counts
+                cls._pending_counts = {}
+                cls._pending_flushed_at = time.monotonic()
             
-            # 设置过期时间（25小时，确保统计完整）
-            self.expire(f"{stats_key}:total", 25 * 3600)
-            self.expire(f"{stats_key}:hits", 25 * 3600)
+            self._flush_cache_request_counts(pending)
             
         except Exception as e:
             logger.error(f"记录缓存统计失败: {e}")
+    
+    def flush_cache_request_counts(self):
+        """
+        立即写入进程内累加的缓存请求统计（进程退出前调用）
+        """
+        with self._pending_lock:
+            pending = ReadingCacheService._pending_counts
+            ReadingCacheService._pending_counts = {}
+            ReadingCacheService._pending_flushed_at = time.monotonic()
+        self._flush_cache_request_counts(pending)
+    
+    def _flush_cache_request_counts(self, pending: Dict[tuple, List[int]]):
+        """
+        用一个MULTI事务写入总请求数、命中数和过期时间，pending的键为(日期, 小时)
+        """
+        if not pending or not self.available:
+            return
+        try:
+            retention = getattr(settings, 'CACHE_STATS_RETENTION_DAYS', 8) * 24 * 3600
+            pipe = self.redis_client.pipeline(transaction=True)
+            for (date, hour), (total, hits, l1_hits) in pending.items():
+                day_key = self.CACHE_STATS_KEY.format(date=date)
+                pipe.hincrby(day_key, f"{hour}:total", total)
+                if hits:
+                    pipe.hincrby(day_key, f"{hour}:hits", hits)
+                if l1_hits:
+                    pipe.hincrby(day_key, f"{hour}:l1_hits", l1_hits)
+                # 保留CACHE_STATS_RETENTION_DAYS天，期间可随时补同步到数据库
+                pipe.expire(day_key, retention)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"写入缓存统计失败: {e}")
 
 
 class CacheMonitorService(CacheService):
@@ -230,55 +1454,101 @@ class CacheMonitorService(CacheService):
     
     def get_cache_hit_rate(self, date: str = None, hour: int = None) -> Dict[str, Any]:
         """
-        获取缓存命中率统计
+        获取缓存命中率统计（一次HMGET）
         """
         if not date:
             date = datetime.now().date()
         if hour is None:
             hour = datetime.now().hour
         
-        stats_key = f"cache_stats:{date}:{hour}"
-        
-        total_requests = self.get(f"{stats_key}:total", 0)
-        cache_hits = self.get(f"{stats_key}:hits", 0)
-        
-        hit_rate = 0
-        if total_requests > 0:
-            hit_rate = round((cache_hits / total_requests) * 100, 2)
+        counts = [0, 0, 0]
+        try:
+            if self.available:
+                values = self.redis_client.hmget(
+                    self.CACHE_STATS_KEY.format(date=date),
+                    [f"{hour}:total", f"{hour}:hits", f"{hour}:l1_hits"]
+                )
+                counts = [int(value or 0) for value in values]
+        except Exception as e:
+            logger.error(f"获取缓存命中率失败 {date} {hour}: {e}")
         
-        return {
-            'date': str(date),
-            'hour': hour,
-            'total_requests': total_requests,
-            'cache_hits': cache_hits,
-            'hit_rate': hit_rate
-        }
+        return self.build_hit_rate(str(date), hour, *counts)
     
     def get_daily_hit_rate(self, date: str = None) -> Dict[str, Any]:
         """
-        获取一天的缓存命中率统计
+        获取一天的缓存命中率统计（一次HGETALL）
         """
         if not date:
             date = str(datetime.now().date())
         
-        hourly_stats = []
-        total_requests = 0
-        total_hits = 0
-        
-        for hour in range(24):
-            stats = self.get_cache_hit_rate(date, hour)
-            hourly_stats.append(stats)
-            total_requests += stats['total_requests']
-            total_hits += stats['cache_hits']
+        hourly_counts = self.get_many_daily_counts([date]).get(date, {})
+        hourly_stats = [
+            self.build_hit_rate(date, hour, *hourly_counts.get(hour, (0, 0, 0)))
+            for hour in range(24)
+        ]
+        total_requests = sum(stats['total_requests'] for stats in hourly_stats)
+        total_hits = sum(stats['cache_hits'] for stats in hourly_stats)
+        total_l1_hits = sum(stats['l1_hits'] for stats in hourly_stats)
         
         daily_hit_rate = 0
+        daily_l1_hit_rate = 0
         if total_requests > 0:
             daily_hit_rate = round((total_hits / total_requests) * 100, 2)
+            daily_l1_hit_rate = round((total_l1_hits / total_requests) * 100, 2)
         
         return {
             'date': date,
             'total_requests': total_requests,
             'total_hits': total_hits,
             'daily_hit_rate': daily_hit_rate,
+            'total_l1_hits': total_l1_hits,
+            'daily_l1_hit_rate': daily_l1_hit_rate,
             'hourly_stats': hourly_stats
-        } 
\ No newline at end of file
+        }
+    
+    def get_many_daily_counts(self, dates: List[str]) -> Dict[str, Dict[int, tuple]]:
+        """
+        一次管道读取多天的计数{日期: {小时: (总请求数, 命中数, L1命中数)}}，Redis中没有的日期不返回
+        """
+        try:
+            if not self.available or not dates:
+                return {}
+            pipe = self.redis_client.pipeline(transaction=False)
+            for date in dates:
+                pipe.hgetall(self.CACHE_STATS_KEY.format(date=date))
+            
+            results = {}
+            for date, fields in zip(dates, pipe.execute()):
+                if not fields:
+                    continue
+                hourly = {}
+                for field, value in fields.items():
+                    hour, name = field.split(':', 1)
+                    counts = hourly.setdefault(int(hour), [0, 0, 0])
+                    counts[('total', 'hits', 'l1_hits').index(name)] = int(value)
+                results[date] = {hour: tuple(counts) for hour, counts in hourly.items()}
+            return results
+        except Exception as e:
+            logger.error(f"批量获取缓存统计失败 {dates}: {e}")
+            return {}
+    
+    def build_hit_rate(self, date: str, hour: int, total_requests: int, cache_hits: int,
+                        l1_hits: int = 0) -> Dict[str, Any]:
+        """
+        由计数计算命中率
+        """
+        hit_rate = 0
+        l1_hit_rate = 0
+        if total_requests > 0:
+            hit_rate = round((cache_hits / total_requests) * 100, 2)
+            l1_hit_rate = round((l1_hits / total_requests) * 100, 2)
+        
+        return {
+            'date': date,
+            'hour': hour,
+            'total_requests': total_requests,
+            'cache_hits': cache_hits,
+            'hit_rate': hit_rate,
+            'l1_hits': l1_hits,
+            'l1_hit_rate': l1_hit_rate
+        }
@@ -0,0 +1,155 @@
+import json
+import logging
+import zlib
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时msgpack编码降级为JSON
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # 可选依赖，未安装时lz4压缩降级为zlib
+    lz4_frame = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# 类型标记（值的第一个字节），旧版本写入的无标记值首字节都是可见字符，不会冲突
+TAG_JSON = b'\x01'
+TAG_MSGPACK = b'\x02'
+TAG_ZLIB = b'\x03'
+TAG_LZ4 = b'\x04'
+
+
+class JSONCodec:
+    """
+    带类型标记的JSON
+    """
+
+    name = 'json'
+
+    def encode(self, value: Any) -> bytes:
+        return TAG_JSON + json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data: bytes) -> Any:
+        return decode_value(data)
+
+
+class MsgpackCodec:
+    """
+    带类型标记的msgpack，比JSON更小、解析更快
+    """
+
+    name = 'msgpack'
+
+    def encode(self, value: Any) -> bytes:
+        return TAG_MSGPACK + msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return decode_value(data)
+
+
+class IntCodec:
+    """
+    计数器 - 不加标记，保持INCR可用，读取时直接转换为整数
+    """
+
+    name = 'int'
+
+    def encode(self, value: Any) -> bytes:
+        return str(int(value)).encode('ascii')
+
+    def decode(self, data: bytes) -> int:
+        return int(data)
+
+
+class CompressedCodec:
+    """
+    超过阈值时压缩的编码，压缩后再加一层压缩算法标记
+    """
+
+    def __init__(self, inner, algorithm: str = 'zlib', threshold: int = 1024):
+        self.inner = inner
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.name = f'{inner.name}+{algorithm}'
+
+    def encode(self, value: Any) -> bytes:
+        data = self.inner.encode(value)
+        if len(data) < self.threshold:
+            return data
+        if self.algorithm == 'lz4':
+            compressed = TAG_LZ4 + lz4_frame.compress(data)
+        else:
+            compressed = TAG_ZLIB + zlib.compress(data, 6)
+        # 压缩后没有变小时保留原值
+        return compressed if len(compressed) < len(data) else data
+
+    def decode(self, data: bytes) -> Any:
+        return decode_value(data)
+
+
+_BASE_CODECS = {
+    'json': JSONCodec(),
+    'msgpack': MsgpackCodec(),
+    'int': IntCodec(),
+}
+_codec_cache: Dict[tuple, Any] = {}
+
+
+def get_codec(spec: str, threshold: int = 1024):
+    """
+    按名称获取编解码器："json"、"msgpack"、"int"，可加压缩后缀如"msgpack+zlib"、"json+lz4"
+
+    可选依赖未安装时msgpack降级为json、lz4降级为zlib
+    """
+    cache_key = (spec, threshold)
+    codec = _codec_cache.get(cache_key)
+    if codec is not None:
+        return codec
+
+    base, _, algorithm = spec.partition('+')
+    if base == 'msgpack' and msgpack is None:
+        logger.warning("未安装msgpack，缓存编码改用JSON")
+        base = 'json'
+    if base not in _BASE_CODECS:
+        raise ValueError(f"未知的缓存编码: {spec}")
+    codec = _BASE_CODECS[base]
+
+    if algorithm:
+        if algorithm == 'lz4' and lz4_frame is None:
+            logger.warning("未安装lz4，缓存压缩改用zlib")
+            algorithm = 'zlib'
+        if algorithm not in ('zlib', 'lz4'):
+            raise ValueError(f"未知的缓存压缩算法: {spec}")
+        codec = CompressedCodec(codec, algorithm, threshold)
+
+    _codec_cache[cache_key] = codec
+    return codec
+
+
+def decode_value(data: Optional[bytes]) -> Any:
+    """
+    按类型标记解码，读取时不依赖当前配置的编码（修改配置后旧值仍可读取）；
+    无标记的旧值按JSON尝试解析，失败时返回字符串
+    """
+    if data is None:
+        return None
+    tag = data[:1]
+    if tag == TAG_ZLIB:
+        return decode_value(zlib.decompress(data[1:]))
+    if tag == TAG_LZ4:
+        return decode_value(lz4_frame.decompress(data[1:]))
+    if tag == TAG_JSON:
+        return json.loads(data[1:])
+    if tag == TAG_MSGPACK:
+        return msgpack.unpackb(data[1:], raw=False)
+
+    text = data.decode('utf-8')
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ..models import Article
+from .cache_service import CacheService
+from .local_cache import get_local_cache
+from .reading_service import ReadingStatsService, CacheStatsService
+
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardService(CacheService):
+    """
+    仪表板服务 - 仪表板数据定时物化为快照，页面只读取快照
+    """
+
+    # 快照结构变化时递增，旧结构的快照自然失效
+    SNAPSHOT_SCHEMA = 1
+    SNAPSHOT_KEY = "dashboard_snapshot:v{schema}:{window}"
+    SNAPSHOT_VERSION_KEY = "dashboard_snapshot:version"
+    SNAPSHOT_LEASE_KEY = "dashboard_snapshot:lease"
+    # 请求路径上生成快照的租约，同一窗口同时只有一个请求计算
+    SNAPSHOT_BUILD_LEASE_KEY = "dashboard_snapshot:build:{window}"
+    LOCAL_SNAPSHOT_KEY = "dashboard:{window}"
+    
+    # 快照用msgpack编码，超过CACHE_COMPRESS_THRESHOLD字节时压缩；版本号是INCR计数器，
+    # 按int编码使set写入的值不带类型标记，INCR仍可用，get时直接转为整数
+    KEY_CODECS = {
+        'dashboard_snapshot:v': 'msgpack+zlib',
+        SNAPSHOT_VERSION_KEY: 'int',
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.reading_service = ReadingStatsService()
+        self.cache_stats_service = CacheStatsService()
+
+    def get_dashboard(self, window: str = 'all', fresh: bool = False) -> Dict[str, Any]:
+        """
+        获取仪表板数据及快照信息（版本、生成时间、已过秒数）
+
+        fresh=True或还没有快照时同步生成（同一窗口只有拿到租约的请求计算）；其余情况直接返回快照
+        """
+        # 按需启动后台刷新线程
+        get_refresher(self.refresh_due_snapshots, self.snapshot_interval())
+
+        snapshot = None if fresh else self.get_snapshot(window)
+        if snapshot is None:
+            snapshot = self._rebuild_snapshot(window, fresh)
+
+        return {
+            **snapshot['data'],
+            'snapshot': {
+                'version': snapshot['version'],
+                'generated_at': snapshot['generated_at'],
+                'age': round(time.time() - snapshot['generated_at'], 3)
+            }
+        }
+
+    def snapshot_interval(self) -> float:
+        """
+        快照刷新间隔（秒）
+        """
+        return getattr(settings, 'DASHBOARD_SNAPSHOT_INTERVAL', 30)
+
+    def get_snapshot(self, window: str) -> Optional[Dict[str, Any]]:
+        """
+        读取快照：优先Redis，Redis不可用时使用本进程最近生成的快照
+        """
+        snapshot = self.get(self.SNAPSHOT_KEY.format(schema=self.SNAPSHOT_SCHEMA, window=window))
+        if isinstance(snapshot, dict):
+            return snapshot
+        return get_local_cache().get(self.LOCAL_SNAPSHOT_KEY.format(window=window))
+
+    def _rebuild_snapshot(self, window: str, fresh: bool = False) -> Dict[str, Any]:
+        """
+        请求路径上生成快照：拿到租约的请求计算，其余请求等待其结果（fresh时只接受本次请求之后生成的），
+        超时后返回已有的快照，仍没有时才自己计算
+        """
+        requested_at = time.time()
+        if self.acquire_build_lease(window):
+            try:
+                return self.refresh_snapshot(window)
+            finally:
+                self.delete(self.SNAPSHOT_BUILD_LEASE_KEY.format(window=window))
+
+        deadline = time.monotonic() + getattr(settings, 'DASHBOARD_SNAPSHOT_LEASE_WAIT', 2.0)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            snapshot = self.get_snapshot(window)
+            if snapshot is not None and (not fresh or snapshot['generated_at'] >= requested_at):
+                return snapshot
+
+        snapshot = self.get_snapshot(window)
+        return snapshot if snapshot is not None else self.refresh_snapshot(window)
+
+    def acquire_build_lease(self, window: str) -> bool:
+        """
+        获取请求路径上生成快照的租约，Redis不可用时返回True（各进程自行计算并缓存在本进程）
+        """
+        try:
+            if not self.available:
+                return True
+            return bool(self.redis_client.set(
+                self.SNAPSHOT_BUILD_LEASE_KEY.format(window=window), os.getpid(), nx=True,
+                ex=getattr(settings, 'DASHBOARD_SNAPSHOT_LEASE_TTL', 30)
+            ))
+        except Exception as e:
+            logger.error(f"获取仪表板快照生成租约失败 {window}: {e}")
+            return True
+
+    def refresh_snapshot(self, window: str) -> Dict[str, Any]:
+        """
+        重新计算仪表板数据并保存为新版本的快照
+        """
+        started = time.monotonic()
+        data = self.build_dashboard_data(window)
+        version = self.incr(self.SNAPSHOT_VERSION_KEY) or 0
+        snapshot = {
+            'version': version,
+            'generated_at': time.time(),
+            'compute_time': round(time.monotonic() - started, 3),
+            'data': json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+        }
+
+        # 快照保留到下一次刷新之后，刷新线程停止时也不会长期返回旧数据
+        ttl = int(self.snapshot_interval() * 10)
+        self.set(self.SNAPSHOT_KEY.format(schema=self.SNAPSHOT_SCHEMA, window=window), snapshot, ttl)
+        get_local_cache().set(self.LOCAL_SNAPSHOT_KEY.format(window=window), snapshot, ttl)
+        return snapshot
+
+    def refresh_due_snapshots(self) -> int:
+        """
+        刷新所有窗口的快照，多个进程同一周期内只有拿到租约的刷新，返回刷新的快照数
+        """
+        interval = self.snapshot_interval()
+        if self.available:
+            try:
+                if not self.redis_client.set(self.SNAPSHOT_LEASE_KEY, os.getpid(), nx=True, ex=max(1, int(interval))):
+                    return 0
+            except Exception as e:
+                logger.error(f"获取仪表板快照租约失败: {e}")
+                return 0
+
+        refreshed = 0
+        for window in self.reading_service.cache_service.LEADERBOARD_WINDOWS:
+            try:
+                self.refresh_snapshot(window)
+                refreshed += 1
+            except Exception as e:
+                logger.error(f"仪表板快照刷新失败 {window}: {e}")
+        return refreshed
+
+    def build_dashboard_data(self, window: str) -> Dict[str, Any]:
+        """
+        计算仪表板数据：缓存命中率、今日缓存统计和热门文章排行
+        """
+        # 获取当前缓存命中率
+        current_hit_rate = self.cache_stats_service.get_current_hit_rate()
+
+        # 获取今日缓存统计
+        daily_stats = self.cache_stats_service.get_daily_stats()
+
+        # 获取热门文章排行（一次ZREVRANGE）
+        top_articles = self.reading_service.get_top_articles(window, 5)
+        articles = Article.objects.filter(is_published=True).select_related('author').only(
+            'id', 'title', 'total_views', 'unique_users', 'unique_ips', 'author__username'
+        ).in_bulk([item['article_id'] for item in top_articles])
+        stats_map = self.reading_service.get_many_article_stats(list(articles), list(articles.values()))
+        popular_articles = []
+        for item in top_articles:
+            article = articles.get(item['article_id'])
+            if article is None:
+                continue
+            popular_articles.append({
+                'id': article.id,
+                'title': article.title,
+                'author': article.author.username,
+                'views': item['views'],
+                'reading_stats': stats_map.get(article.id, {})
+            })
+
+        return {
+            'current_hit_rate': current_hit_rate,
+            'daily_cache_stats': daily_stats,
+            'popular_window': window,
+            'popular_articles': popular_articles
+        }
+
+
+class DashboardSnapshotRefresher(threading.Thread):
+    """
+    后台刷新线程 - 定时重新生成仪表板快照
+    """
+
+    def __init__(self, refresh_func, interval: float):
+        super().__init__(name='dashboard-snapshot-refresher', daemon=True)
+        self.refresh_func = refresh_func
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh_func()
+            except Exception as e:
+                logger.error(f"仪表板快照刷新失败: {e}")
+
+
+_refresher: Optional[DashboardSnapshotRefresher] = None
+_refresher_lock = threading.Lock()
+_refresher_pid = None
+
+
+def get_refresher(refresh_func, interval: float) -> DashboardSnapshotRefresher:
+    """
+    获取当前进程的快照刷新线程（按需启动，fork后在子进程中重新启动）
+    """
+    global _refresher, _refresher_pid
+    if _refresher is not None and _refresher_pid == os.getpid():
+        return _refresher
+    with _refresher_lock:
+        if _refresher is None or _refresher_pid != os.getpid():
+            _refresher = DashboardSnapshotRefresher(refresh_func, interval)
+            _refresher.start()
+            _refresher_pid = os.getpid()
+        return _refresher
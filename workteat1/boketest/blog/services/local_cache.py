@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import math
+import os
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUCache:
+    """
+    进程内L1缓存 - 按条目数和字节数双重限制的LRU，条目带过期时间
+
+    缓存的对象在多个请求间共享，调用方只能读取不能修改
+    """
+
+    def __init__(self, max_items: int = 10000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None) -> Any:
+        """
+        获取缓存，过期或不存在时返回default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, timeout: float) -> bool:
+        """
+        设置缓存，超过单条字节上限的值不缓存
+        """
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"L1缓存无法估算大小 {key}: {e}")
+            return False
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + timeout, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_items or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+        return True
+
+    def delete(self, key: str) -> bool:
+        """
+        删除缓存
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get_stats(self):
+        """
+        L1缓存使用情况
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'items': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits / total) * 100, 2) if total else 0
+            }
+
+
+class WindowBloomFilter:
+    """
+    带时间窗口的布隆过滤器 - Redis不可用时在进程内判断重复访问
+
+    使用两代位图，每半个窗口轮换一次，元素在加入后保留半个到一个窗口；
+    存在极少误判（把新访问当作重复），不会漏判
+    """
+
+    def __init__(self, window: float, capacity: int = 100000, error_rate: float = 0.001):
+        self.window = window
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _contains(bits: bytearray, positions) -> bool:
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+    def add(self, key: str) -> bool:
+        """
+        加入元素，返回窗口内是否首次出现
+        """
+        positions = self._positions(key)
+        with self._lock:
+            now = time.monotonic()
+            if now - self._rotated_at >= self.window / 2:
+                # 超过一个窗口没有轮换时两代都已过期
+                expired = now - self._rotated_at >= self.window
+                self._previous = bytearray(len(self._current)) if expired else self._current
+                self._current = bytearray(len(self._previous))
+                self._rotated_at = now
+
+            if self._contains(self._current, positions) or self._contains(self._previous, positions):
+                return False
+            for pos in positions:
+                self._current[pos >> 3] |= 1 << (pos & 7)
+            return True
+
+
+class ArticleRateSampler:
+    """
+    热点文章采样器 - 按本进程内每篇文章每秒的阅读次数决定采样率
+
+    超过阈值时每N次只记录1次、每次按N累加（N为2的幂，不超过max_rate），流量回落后恢复逐条计数
+    """
+
+    def __init__(self, qps_threshold: float, max_rate: int = 64, max_articles: int = 10000):
+        self.qps_threshold = qps_threshold
+        self.max_rate = max_rate
+        self.max_articles = max_articles
+        self._windows = {}  # article_id -> [window_start, count, previous_count]
+        self._lock = threading.Lock()
+
+    def sampling_rate(self, article_id: int) -> int:
+        """
+        统计一次阅读并返回文章当前的采样率N（1表示逐条计数）
+        """
+        if self.qps_threshold <= 0:
+            return 1
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(article_id)
+            if window is None or now - window[0] >= 1:
+                # 只有紧邻的上一秒才作为速率参考
+                previous = window[1] if window is not None and now - window[0] < 2 else 0
+                window = [now, 0, previous]
+                if article_id not in self._windows and len(self._windows) >= self.max_articles:
+                    self._prune(now)
+                self._windows[article_id] = window
+            window[1] += 1
+            qps = max(window[1], window[2])
+
+        if qps <= self.qps_threshold:
+            return 1
+        rate = 1 << math.ceil(math.log2(qps / self.qps_threshold))
+        return min(rate, self.max_rate)
+
+    def should_record(self, rate: int) -> bool:
+        """
+        按1/N的概率决定本次阅读是否记录
+        """
+        return rate <= 1 or random.random() * rate < 1
+
+    def _prune(self, now: float):
+        for article_id in [key for key, window in self._windows.items() if now - window[0] >= 2]:
+            del self._windows[article_id]
+        if len(self._windows) >= self.max_articles:
+            self._windows.clear()
+
+
+_local_cache: Optional[LocalLRUCache] = None
+_local_cache_pid = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache() -> LocalLRUCache:
+    """
+    获取当前进程的L1缓存（fork后子进程重新创建）
+    """
+    global _local_cache, _local_cache_pid
+    if _local_cache is not None and _local_cache_pid == os.getpid():
+        return _local_cache
+
+    with _local_cache_lock:
+        if _local_cache is None or _local_cache_pid != os.getpid():
+            _local_cache = LocalLRUCache(
+                max_items=getattr(settings, 'L1_CACHE_MAX_ITEMS', 10000),
+                max_bytes=getattr(settings, 'L1_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+            )
+            _local_cache_pid = os.getpid()
+        return _local_cache
+
+
+_dedup_filter: Optional[WindowBloomFilter] = None
+_dedup_filter_pid = None
+
+
+def get_dedup_filter(window: float) -> WindowBloomFilter:
+    """
+    获取当前进程的阅读去重布隆过滤器（fork后子进程重新创建）
+    """
+    global _dedup_filter, _dedup_filter_pid
+    if _dedup_filter is not None and _dedup_filter_pid == os.getpid() and _dedup_filter.window == window:
+        return _dedup_filter
+
+    with _local_cache_lock:
+        if _dedup_filter is None or _dedup_filter_pid != os.getpid() or _dedup_filter.window != window:
+            _dedup_filter = WindowBloomFilter(
+                window,
+                capacity=getattr(settings, 'READING_DEDUP_BLOOM_CAPACITY', 100000),
+                error_rate=getattr(settings, 'READING_DEDUP_BLOOM_ERROR_RATE', 0.001)
+            )
+            _dedup_filter_pid = os.getpid()
+        return _dedup_filter
+
+
+_rate_sampler: Optional[ArticleRateSampler] = None
+_rate_sampler_pid = None
+
+
+def get_rate_sampler() -> ArticleRateSampler:
+    """
+    获取当前进程的热点文章采样器（fork后子进程重新创建）
+    """
+    global _rate_sampler, _rate_sampler_pid
+    if _rate_sampler is not None and _rate_sampler_pid == os.getpid():
+        return _rate_sampler
+
+    with _local_cache_lock:
+        if _rate_sampler is None or _rate_sampler_pid != os.getpid():
+            _rate_sampler = ArticleRateSampler(
+                getattr(settings, 'READING_SAMPLING_QPS_THRESHOLD', 0),
+                max_rate=getattr(settings, 'READING_SAMPLING_MAX_RATE', 64)
+            )
+            _rate_sampler_pid = os.getpid()
+        return _rate_sampler
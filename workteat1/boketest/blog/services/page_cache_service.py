@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Optional
+from django.conf import settings
+
+from ..models import Article
+from .cache_service import CacheService
+from .local_cache import get_local_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArticlePageCacheService(CacheService):
+    """
+    文章页面缓存 - 匿名访问的文章页（HTML和JSON）整页缓存，阅读量由页面单独上报
+
+    键中包含文章的updated_at，文章修改后自然读取新键，旧页面等待过期
+    """
+
+    PAGE_KEY = "article_page:{article_id}:{version}:{fmt}"
+
+    # 页面体积较大，超过CACHE_COMPRESS_THRESHOLD字节时压缩
+    KEY_CODECS = {
+        'article_page:': 'json+zlib',
+    }
+
+    def is_enabled(self) -> bool:
+        """
+        是否开启页面缓存模式
+        """
+        return getattr(settings, 'ARTICLE_PAGE_CACHE_ENABLED', False)
+
+    def page_key(self, article: Article, fmt: str) -> str:
+        """
+        页面缓存键（fmt为html或json）
+        """
+        version = int(article.updated_at.timestamp() * 1000000)
+        return self.PAGE_KEY.format(article_id=article.id, version=version, fmt=fmt)
+
+    def get_page(self, article: Article, fmt: str) -> Optional[Any]:
+        """
+        读取缓存的页面：优先L1，其次Redis（命中后回填L1）
+        """
+        key = self.page_key(article, fmt)
+        local_cache = get_local_cache()
+        page = local_cache.get(key)
+        if page is not None:
+            return page
+
+        page = self.get(key)
+        if page is not None:
+            local_cache.set(key, page, getattr(settings, 'L1_PAGE_TTL', 30))
+        return page
+
+    def set_page(self, article: Article, fmt: str, page: Any) -> bool:
+        """
+        缓存渲染好的页面（HTML字符串或JSON数据）
+        """
+        key = self.page_key(article, fmt)
+        get_local_cache().set(key, page, getattr(settings, 'L1_PAGE_TTL', 30))
+        return self.set(key, page, getattr(settings, 'ARTICLE_PAGE_CACHE_TTL', 300))
@@ -1,12 +1,19 @@
 import logging
-from typing import Dict, Any, Optional, Union
-from datetime import datetime
-from django.db import transaction
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Union
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
 from django.contrib.auth.models import User
-from django.db.models import F, Sum, Count
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
-from ..models import Article, ReadingStats, CacheHitStats
+from ..models import Article, ArticleViewRollup, ReadingStats, CacheHitStats
 from .cache_service import ReadingCacheService, CacheMonitorService
+from .buffer_service import ReadingBufferService, get_flusher
+from .local_cache import get_dedup_filter, get_rate_sampler
 from .exceptions import (
     CacheException, DatabaseException, ValidationException, 
     ExceptionHandler, FallbackStrategy, ExceptionLevel
@@ -24,11 +31,15 @@ class ReadingStatsService:
     def __init__(self):
         self.cache_service = ReadingCacheService()
         self.monitor_service = CacheMonitorService()
+        self.buffer_service = ReadingBufferService()
     
     def record_reading(self, article_id: int, user: User = None, 
-                      ip_address: str = None, user_agent: str = None) -> Dict[str, Any]:
+                      ip_address: str = None, user_agent: str = None,
+                      with_stats: bool = True) -> Dict[str, Any]:
         """
         记录用户阅读 - 主要业务逻辑方法
+        
+        with_stats=False时只计数，不读取最新统计（阅读计数接口使用）
         """
         try:
             # 参数验证
@@ -38,26 +49,59 @@ class ReadingStatsService:
             if not user and not ip_address:
                 raise ValidationException("用户或IP地址至少提供一个")
             
-            # 检查文章是否存在
-            try:
-                article = Article.objects.get(id=article_id, is_published=True)
-            except Article.DoesNotExist:
+            # 检查文章是否存在（优先读L1缓存）
+            if self.get_published_article(article_id) is None:
                 raise ValidationException(f"文章不存在或未发布: {article_id}")
             
-            # 更新缓存统计
-            cache_updated = self._update_cache_stats(article_id, user, ip_address)
+            write_behind = self.buffer_service.is_enabled()
+            
+            # 去重窗口内的重复阅读（刷新、爬虫）不写缓存和数据库
+            if not self._claim_reading(article_id, user, ip_address):
+                stats = dict(self.get_article_stats(article_id)) if with_stats else {}
+                stats['sampling_rate'] = 1
+                return {
+                    'success': True,
+                    'article_id': article_id,
+                    'deduplicated': True,
+                    'sampled': False,
+                    'cache_updated': False,
+                    'database_updated': False,
+                    'write_behind': write_behind,
+                    'stats': stats
+                }
             
-            # 异步更新数据库（这里用同步模拟，实际可用Celery）
-            db_updated = self._update_database_stats(article_id, user, ip_address, user_agent)
+            # 热点文章采样：超过QPS阈值时每N次只记录1次、按N累加
+            sampler = get_rate_sampler()
+            sampling_rate = sampler.sampling_rate(article_id)
+            sampled = sampler.should_record(sampling_rate)
+            db_updated = cache_updated = False
+            if sampled:
+                # 更新数据库：写回模式下先进入缓冲，由后台线程批量落库
+                if write_behind:
+                    db_updated = self._buffer_database_stats(
+                        article_id, user, ip_address, user_agent, sampling_rate
+                    )
+                else:
+                    db_updated = self._update_database_stats(
+                        article_id, user, ip_address, user_agent, sampling_rate
+                    )
+                
+                # 更新缓存统计（同步模式下在数据库之后，冷启动初始化时能包含本次阅读；
+                # 写回模式下数据库还不包含缓冲中的阅读，初始化时与已累加的增量合并）
+                cache_updated = self._update_cache_stats(article_id, user, ip_address, sampling_rate)
             
-            # 获取最新统计数据
-            stats = self.get_article_stats(article_id)
+            # 获取最新统计数据（缓存中的统计在请求间共享，复制后再附加采样率）
+            stats = dict(self.get_article_stats(article_id)) if with_stats else {}
+            stats['sampling_rate'] = sampling_rate
             
             return {
                 'success': True,
                 'article_id': article_id,
+                'deduplicated': False,
+                'sampled': sampled,
                 'cache_updated': cache_updated,
                 'database_updated': db_updated,
+                'write_behind': write_behind,
                 'stats': stats
             }
             
@@ -65,23 +109,77 @@ class ReadingStatsService:
             error_info = ExceptionHandler.handle_exception(e, f"记录阅读-文章{article_id}")
             return error_info
     
-    def get_article_stats(self, article_id: int) -> Dict[str, Any]:
+    def _claim_reading(self, article_id: int, user: User = None, ip_address: str = None) -> bool:
+        """
+        判断本次阅读是否计数 - 同一访客在READING_DEDUP_WINDOW秒内对同一文章只计一次
+        
+        Redis不可用时使用进程内布隆过滤器，只在本进程内去重
+        """
+        window = getattr(settings, 'READING_DEDUP_WINDOW', 0)
+        if window <= 0:
+            return True
+        
+        user_id = user.id if user else None
+        claimed = self.cache_service.claim_reading_window(article_id, user_id, ip_address, window)
+        if claimed is not None:
+            return claimed
+        visitor = self.cache_service.reading_visitor(user_id, ip_address)
+        return get_dedup_filter(window).add(f"{article_id}:{visitor}")
+    
+    def get_published_article(self, article_id: int) -> Optional[Article]:
+        """
+        获取已发布的文章 - 优先读L1进程内缓存，文章保存时通过pub/sub失效
+        
+        返回的对象在请求间共享，只能读取不能修改
+        """
+        key = self.cache_service.LOCAL_ARTICLE_KEY.format(article_id=article_id)
+        article = self.cache_service.get_local(key)
+        if article is not None:
+            return article
+        
+        article = Article.objects.filter(
+            id=article_id, is_published=True
+        ).select_related('author').first()
+        if article is not None:
+            self.cache_service.set_local(key, article, getattr(settings, 'L1_ARTICLE_TTL', 300))
+        return article
+    
+    def get_article_stats(self, article_id: int, exact: bool = False) -> Dict[str, Any]:
         """
         获取文章统计数据 - 读优先访问缓存
+        
+        默认独立用户/IP数为HyperLogLog近似值，exact=True时从数据库精确统计
         """
         try:
+            if exact:
+                return self._get_database_stats(article_id)
+            
+            if not self.cache_service.is_available():
+                # Redis不可用：读取文章行上的计数
+                return self._get_fallback_stats(article_id)
+            
             # 优先从缓存读取
-            if self.cache_service.is_available():
-                cache_stats = self.cache_service.get_article_stats(article_id)
-                if cache_stats and cache_stats.get('total_views', 0) > 0:
-                    return cache_stats
+            cache_stats, refresh_due = self.cache_service.get_article_stats_entry(article_id)
+            if cache_stats is not None:
+                # 临近或已过逻辑过期：拿到租约的请求重算，其他请求继续返回旧值
+                if refresh_due and self.cache_service.acquire_refresh_lease(article_id):
+                    return self._refresh_article_cache_stats(article_id, cache_stats)
+                return cache_stats
             
-            # 缓存未命中，从数据库读取
-            db_stats = self._get_database_stats(article_id)
+            # 缓存未命中：拿到租约的请求读取文章行上的计数，其他请求短暂等待其初始化结果
+            leased = self.cache_service.acquire_refresh_lease(article_id)
+            if not leased:
+                cache_stats = self._wait_for_article_cache_stats(article_id)
+                if cache_stats is not None:
+                    return cache_stats
             
-            # 更新缓存
-            if self.cache_service.is_available() and db_stats:
-                self.cache_service.update_article_stats(article_id, db_stats)
+            try:
+                started = time.monotonic()
+                db_stats = self._get_counter_stats(article_id)
+                self._hydrate_article_cache_stats(article_id, db_stats, time.monotonic() - started)
+            finally:
+                if leased:
+                    self.cache_service.release_refresh_leases([article_id])
             
             return db_stats
             
@@ -95,6 +193,206 @@ class ReadingStatsService:
                 'error': error_info.get('error_message')
             }
     
+    def get_many_article_stats(self, article_ids: List[int],
+                               articles: List[Article] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        批量获取多篇文章的统计数据 - 一次Redis管道读取，未命中的文章读取文章行上的计数
+        
+        调用方已查出的文章通过articles传入，直接使用其计数字段，不再查询数据库
+        """
+        article_ids = list(dict.fromkeys(article_ids))
+        try:
+            results = {}
+            cache_available = self.cache_service.is_available()
+            
+            refresh_ids = set()
+            
+            # 优先从缓存批量读取
+            if cache_available:
+                cached, refresh_due_ids = self.cache_service.get_many_article_stats_entries(article_ids)
+                for article_id, cache_stats in cached.items():
+                    if cache_stats is not None:
+                        results[article_id] = cache_stats
+                
+                # 临近过期的文章只重算拿到租约的，其余继续返回旧值
+                refresh_ids = self.cache_service.acquire_refresh_leases(
+                    [article_id for article_id in refresh_due_ids if article_id in results]
+                )
+            
+            # 缓存未命中和需要刷新的文章，读取文章行上的计数
+            missing_ids = [
+                article_id for article_id in article_ids
+                if article_id not in results or article_id in refresh_ids
+            ]
+            if missing_ids:
+                try:
+                    started = time.monotonic()
+                    db_stats = self._get_many_counter_stats(missing_ids, articles)
+                    results.update(db_stats)
+                    
+                    # 一次管道回填缓存
+                    if cache_available:
+                        self._hydrate_many_article_cache_stats(db_stats, time.monotonic() - started)
+                finally:
+                    if refresh_ids:
+                        self.cache_service.release_refresh_leases(list(refresh_ids))
+            
+            return results
+            
+        except Exception as e:
+            error_info = ExceptionHandler.handle_exception(e, f"批量获取统计-文章{article_ids}")
+            return {
+                article_id: {
+                    'total_views': 0,
+                    'unique_users': 0,
+                    'unique_ips': 0,
+                    'error': error_info.get('error_message')
+                }
+                for article_id in article_ids
+            }
+    
+    def get_top_articles(self, window: str = 'all', n: int = 10) -> List[Dict[str, Any]]:
+        """
+        获取热门文章排行 - 读取Redis有序集合，返回[{'article_id', 'views'}]
+        
+        window为all（总榜）、day（当日）或hour（最近一小时）；
+        Redis不可用时总榜按文章行上的总阅读量排序，日榜/小时榜按已落库的小时汇总统计
+        """
+        if window not in self.cache_service.LEADERBOARD_WINDOWS:
+            raise ValidationException(f"不支持的排行榜窗口: {window}")
+        
+        ranking = self.cache_service.get_leaderboard(window, n)
+        if ranking is None and window == 'all' and self.cache_service.is_available():
+            # 总榜未初始化：拿到租约的请求从数据库初始化，其他请求本次走数据库
+            if self.cache_service.acquire_leaderboard_seed_lease():
+                self.cache_service.seed_leaderboard(
+                    Article.objects.filter(is_published=True, total_views__gt=0).values_list(
+                        'id', 'total_views'
+                    ).iterator()
+                )
+                ranking = self.cache_service.get_leaderboard(window, n)
+        
+        if ranking is None and window == 'all':
+            ranking = Article.objects.filter(is_published=True).order_by(
+                '-total_views', '-id'
+            ).values_list('id', 'total_views')[:n]
+        elif ranking is None:
+            ranking = self._get_rollup_ranking(window, n)
+        
+        return [{'article_id': article_id, 'views': views} for article_id, views in ranking]
+    
+    def _get_rollup_ranking(self, window: str, n: int) -> List[tuple]:
+        """
+        按ArticleViewRollup统计日榜（本地日期当天）或小时榜（最近一小时所在的小时起）
+        """
+        if window == 'day':
+            since = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            since = self._rollup_bucket_start(int((time.time() - 3600) // 3600))
+        return ArticleViewRollup.objects.filter(
+            bucket_start__gte=since, article__is_published=True
+        ).values('article').annotate(total=Sum('views')).order_by('-total', '-article').values_list(
+            'article', 'total'
+        )[:n]
+    
+    def get_article_timeseries(self, article_id: int, granularity: str = 'hour', days: int = 7) -> Dict[str, Any]:
+        """
+        获取文章最近days天的阅读趋势，granularity为hour或day
+        
+        已落库的小时读取ArticleViewRollup，尚未落库的小时读取Redis；
+        按小时返回最近days*24个小时，按天返回从本地日期days-1天前的0点起的days个自然日（当天为不完整的一天）；
+        按天降采样时独立访客数为各小时之和（同一访客跨小时会重复计数）
+        """
+        if granularity not in ('hour', 'day'):
+            raise ValidationException(f"不支持的时间粒度: {granularity}")
+        days = max(1, min(days, getattr(settings, 'TIMESERIES_MAX_DAYS', 90)))
+        
+        current_hour = int(time.time() // 3600)
+        if granularity == 'day':
+            first_day = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=days - 1),
+                                                             datetime.min.time()))
+            first_hour = int(first_day.timestamp() // 3600)
+        else:
+            first_hour = current_hour - days * 24 + 1
+        hourly = {}
+        for bucket_start, views, unique_visitors in ArticleViewRollup.objects.filter(
+            article_id=article_id,
+            bucket_start__gte=self._rollup_bucket_start(first_hour)
+        ).values_list('bucket_start', 'views', 'unique_visitors'):
+            hourly[int(bucket_start.timestamp() // 3600)] = (views, unique_visitors)
+        
+        # Redis中的小时累计值比已落库的更新
+        pending_hours = [hour for hour in self.cache_service.get_rollup_hours() if hour >= first_hour]
+        hourly.update(self.cache_service.get_many_rollup_counts(pending_hours, article_id))
+        
+        points = {}
+        for hour in range(first_hour, current_hour + 1):
+            bucket_start = timezone.localtime(self._rollup_bucket_start(hour))
+            if granularity == 'day':
+                bucket_start = bucket_start.replace(hour=0, minute=0)
+            point = points.setdefault(bucket_start, {
+                'bucket_start': bucket_start.isoformat(), 'views': 0, 'unique_visitors': 0
+            })
+            views, unique_visitors = hourly.get(hour, (0, 0))
+            point['views'] += views
+            point['unique_visitors'] += unique_visitors
+        
+        return {
+            'article_id': article_id,
+            'granularity': granularity,
+            'days': days,
+            'points': list(points.values())
+        }
+    
+    def flush_view_rollups(self) -> int:
+        """
+        将Redis中按小时累加的阅读量写入ArticleViewRollup，返回写入的行数
+        
+        Redis中是整小时的累计值，写入时覆盖而不是累加，重复执行是幂等的；
+        结束超过一分钟的小时落库后清理Redis数据
+        """
+        closed_before = int((time.time() - 60) // 3600)
+        written = 0
+        for hour in self.cache_service.get_rollup_hours():
+            counts = self.cache_service.get_rollup_counts(hour)
+            if counts:
+                # 跳过已删除的文章
+                article_ids = set(Article.objects.filter(id__in=counts).values_list('id', flat=True))
+                bucket_start = self._rollup_bucket_start(hour)
+                try:
+                    ArticleViewRollup.objects.bulk_create(
+                        [
+                            ArticleViewRollup(
+                                article_id=article_id,
+                                bucket_start=bucket_start,
+                                views=views,
+                                unique_visitors=unique_visitors
+                            )
+                            for article_id, (views, unique_visitors) in counts.items()
+                            if article_id in article_ids
+                        ],
+                        update_conflicts=True,
+                        unique_fields=['article', 'bucket_start'],
+                        update_fields=['views', 'unique_visitors']
+                    )
+                except Exception as e:
+                    logger.error(f"小时阅读量落库失败 {bucket_start}: {str(e)}")
+                    break
+                written += len(article_ids)
+            
+            if hour < closed_before:
+                self.cache_service.clear_rollup_hour(hour, counts)
+        
+        if written:
+            logger.info(f"小时阅读量落库完成: {written}行")
+        return written
+    
+    def _rollup_bucket_start(self, hour: int) -> datetime:
+        """
+        小时编号转为该小时的起始时间
+        """
+        return datetime.fromtimestamp(hour * 3600, tz=dt_timezone.utc)
+    
     def get_user_reading_stats(self, article_id: int, user_id: int) -> Dict[str, Any]:
         """
         获取用户对特定文章的阅读统计
@@ -142,24 +440,26 @@ class ReadingStatsService:
                 'error': error_info.get('error_message')
             }
     
-    def _update_cache_stats(self, article_id: int, user: User = None, ip_address: str = None) -> bool:
+    def _update_cache_stats(self, article_id: int, user: User = None, ip_address: str = None,
+                            amount: int = 1) -> bool:
         """
-        更新缓存统计数据
+        更新缓存统计数据（采样计数时amount为采样率，只计入文章级汇总）
         """
         try:
+            # 一次往返递增总阅读量、用户/IP阅读次数并记录独立用户/IP
+            hydrated = self.cache_service.record_article_view(
+                article_id, user.id if user else None, ip_address, amount
+            )
+            
             if not self.cache_service.is_available():
                 raise CacheException("Redis缓存不可用", ExceptionLevel.WARNING)
             
-            # 更新用户阅读次数
-            if user:
-                self.cache_service.incr_user_reading_count(article_id, user.id)
-            
-            # 更新IP阅读次数
-            if ip_address:
-                self.cache_service.incr_ip_reading_count(article_id, ip_address)
-            
-            # 更新文章总统计
-            self._update_article_cache_stats(article_id)
+            # 计数器未初始化时才访问数据库（同一篇文章只由拿到租约的请求初始化）
+            if not hydrated and self.cache_service.acquire_refresh_lease(article_id):
+                try:
+                    self._hydrate_article_cache_stats(article_id)
+                finally:
+                    self.cache_service.release_refresh_leases([article_id])
             
             return True
             
@@ -167,64 +467,382 @@ class ReadingStatsService:
             logger.warning(f"缓存更新失败: {str(e)}")
             return False
     
-    def _update_article_cache_stats(self, article_id: int):
+    def _hydrate_article_cache_stats(self, article_id: int, db_stats: Dict[str, int] = None,
+                                     compute_time: float = 0.0):
         """
-        更新文章的缓存统计数据
+        从数据库初始化文章计数器和独立用户/IP基数草图（冷启动）
         """
         try:
-            # 从数据库获取最新统计
-            db_stats = self._get_database_stats(article_id)
+            if db_stats is None:
+                started = time.monotonic()
+                db_stats = {'total_views': self._get_database_total_views(article_id)}
+                compute_time = time.monotonic() - started
+            self.cache_service.update_article_stats(
+                article_id, db_stats, compute_time, merge=self.buffer_service.is_enabled()
+            )
             
-            # 更新缓存
-            if db_stats:
-                self.cache_service.update_article_stats(article_id, db_stats)
+            if not self.cache_service.has_unique_sketch(article_id):
+                self._seed_unique_sketch(article_id)
                 
         except Exception as e:
-            logger.warning(f"文章缓存统计更新失败: {str(e)}")
+            logger.warning(f"文章缓存统计初始化失败: {str(e)}")
+    
+    def _refresh_article_cache_stats(self, article_id: int, cache_stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        用数据库总阅读量校准文章计数器（调用方已持有租约），失败时返回旧值
+        """
+        try:
+            started = time.monotonic()
+            total_views = self._get_database_total_views(article_id)
+            write_behind = self.buffer_service.is_enabled()
+            self.cache_service.update_article_stats(
+                article_id, {'total_views': total_views}, time.monotonic() - started, merge=write_behind
+            )
+            if write_behind:
+                # 数据库总量不包含缓冲中的阅读，不能比缓存中的值小
+                total_views = max(total_views, cache_stats.get('total_views', 0))
+            return {**cache_stats, 'total_views': total_views}
+        except Exception as e:
+            logger.warning(f"文章缓存统计刷新失败，返回旧值: {str(e)}")
+            return cache_stats
+        finally:
+            self.cache_service.release_refresh_leases([article_id])
+    
+    def _wait_for_article_cache_stats(self, article_id: int) -> Optional[Dict[str, Any]]:
+        """
+        其他请求正在从数据库初始化时，短暂轮询等待其结果，超时返回None
+        """
+        deadline = time.monotonic() + getattr(settings, 'READING_STATS_LEASE_WAIT', 0.2)
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            cache_stats = self.cache_service.peek_article_stats(article_id)
+            if cache_stats is not None:
+                return cache_stats
+        return None
+    
+    def _hydrate_many_article_cache_stats(self, stats_map: Dict[int, Dict[str, int]], compute_time: float = 0.0):
+        """
+        批量初始化文章计数器和基数草图
+        """
+        try:
+            self.cache_service.update_many_article_stats(
+                stats_map, compute_time, merge=self.buffer_service.is_enabled()
+            )
+            
+            seeded = self.cache_service.get_seeded_articles(list(stats_map))
+            unseeded = [article_id for article_id in stats_map if article_id not in seeded]
+            if unseeded:
+                self._seed_unique_sketches(unseeded)
+                
+        except Exception as e:
+            logger.warning(f"文章缓存统计批量初始化失败: {str(e)}")
+    
+    def _seed_unique_sketches(self, article_ids: List[int]):
+        """
+        批量初始化基数草图：两次查询取出所有文章的用户/IP
+        """
+        user_ids = defaultdict(list)
+        for article_id, user_id in ReadingStats.objects.filter(
+            article_id__in=article_ids,
+            user__isnull=False
+        ).values_list('article_id', 'user_id').distinct().iterator():
+            user_ids[article_id].append(user_id)
+        
+        ip_addresses = defaultdict(list)
+        for article_id, ip_address in ReadingStats.objects.filter(
+            article_id__in=article_ids,
+            ip_address__isnull=False
+        ).values_list('article_id', 'ip_address').distinct().iterator():
+            ip_addresses[article_id].append(ip_address)
+        
+        for article_id in article_ids:
+            self.cache_service.seed_unique_readers(
+                article_id, user_ids[article_id], ip_addresses[article_id]
+            )
+    
+    def _seed_unique_sketch(self, article_id: int) -> bool:
+        """
+        用数据库中已有的用户/IP初始化基数草图
+        """
+        user_ids = ReadingStats.objects.filter(
+            article_id=article_id,
+            user__isnull=False
+        ).values_list('user_id', flat=True).distinct()
+        
+        ip_addresses = ReadingStats.objects.filter(
+            article_id=article_id,
+            ip_address__isnull=False
+        ).values_list('ip_address', flat=True).distinct()
+        
+        return self.cache_service.seed_unique_readers(
+            article_id, user_ids.iterator(), ip_addresses.iterator()
+        )
+    
+    def _get_fallback_stats(self, article_id: int) -> Dict[str, Any]:
+        """
+        Redis不可用时的统计数据：直接读取文章行上的反范式计数，避免聚合阅读记录
+        """
+        return self._get_counter_stats(article_id)
     
     @FallbackStrategy.database_fallback(default_value=False)
     def _update_database_stats(self, article_id: int, user: User = None, 
-                              ip_address: str = None, user_agent: str = None) -> bool:
+                              ip_address: str = None, user_agent: str = None, amount: int = 1) -> bool:
+        """
+        更新数据库统计数据 - 使用数据库降级策略，单条upsert语句完成插入或递增
+        
+        采样增量amount只计入文章总阅读量，阅读记录的read_count每次加1
+        """
+        try:
+            self._upsert_reading_stats([
+                (article_id, user.id if user else None, ip_address, user_agent, 1, timezone.now(), amount)
+            ])
+            return True
+                
+        except Exception as e:
+            raise DatabaseException(f"数据库更新失败: {str(e)}", ExceptionLevel.ERROR)
+    
+    def _upsert_reading_stats(self, rows: List[tuple]):
+        """
+        批量upsert阅读记录，rows为(article_id, user_id, ip_address, user_agent, read_count, read_at, views)，
+        views为计入文章总阅读量的增量（含采样倍数）；同一冲突键只能出现一次（写回刷新时已合并）
+        
+        登录用户按(文章, 用户)冲突，匿名访问按(文章, IP)冲突，与模型上的条件唯一约束一一对应；
+        每种冲突目标一条多行VALUES语句（超过参数上限时分批），由数据库完成插入或递增，不再先查后写。
+        文章上的总阅读量和独立用户/IP数在同一事务内递增：RETURNING的read_count等于本次写入量即为新记录
+        """
+        if not rows:
+            return
+        
+        # 固定加锁顺序，避免并发批量写入互相死锁
+        rows = sorted(rows, key=lambda row: (row[0], row[1] or 0, row[2] or ''))
+        features = connection.features
+        if not (features.supports_update_conflicts_with_target and features.supports_partial_indexes
+                and features.can_return_columns_from_insert):
+            with transaction.atomic():
+                new_rows = [row for row in rows if self._upsert_reading_stat_fallback(*row[:6])]
+                self._increment_article_counters(rows, new_rows)
+            return
+        
+        opts = ReadingStats._meta
+        quote = connection.ops.quote_name
+        table = quote(opts.db_table)
+        columns = {
+            name: quote(opts.get_field(name).column)
+            for name in ('article', 'user', 'ip_address', 'user_agent',
+                         'read_count', 'first_read_at', 'last_read_at')
+        }
+        insert_sql = (
+            f"INSERT INTO {table} ({columns['article']}, {columns['user']}, {columns['ip_address']}, "
+            f"{columns['user_agent']}, {columns['read_count']}, {columns['first_read_at']}, "
+            f"{columns['last_read_at']}) VALUES {{values}} "
+        )
+        update_sql = (
+            f"DO UPDATE SET {columns['read_count']} = {table}.{columns['read_count']} + excluded.{columns['read_count']}, "
+            f"{columns['last_read_at']} = excluded.{columns['last_read_at']}, "
+            f"{columns['user_agent']} = COALESCE(excluded.{columns['user_agent']}, {table}.{columns['user_agent']})"
+        )
+        returning_sql = (
+            f" RETURNING {columns['article']}, {columns['user']}, {columns['ip_address']}, {columns['read_count']}"
+        )
+        user_sql = (
+            insert_sql
+            + f"ON CONFLICT ({columns['article']}, {columns['user']}) WHERE {columns['user']} IS NOT NULL "
+            + update_sql
+            + f", {columns['ip_address']} = COALESCE(excluded.{columns['ip_address']}, {table}.{columns['ip_address']})"
+            + returning_sql
+        )
+        anonymous_sql = (
+            insert_sql
+            + f"ON CONFLICT ({columns['article']}, {columns['ip_address']}) WHERE {columns['user']} IS NULL "
+            + update_sql
+            + returning_sql
+        )
+        
+        user_rows = {(row[0], row[1]): row for row in rows if row[1] is not None}
+        anonymous_rows = {(row[0], row[2]): row for row in rows if row[1] is None}
+        batch_size = connection.ops.bulk_batch_size(list(columns), rows)
+        
+        new_rows = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for sql, grouped in ((user_sql, user_rows), (anonymous_sql, anonymous_rows)):
+                    batch = list(grouped.values())
+                    for start in range(0, len(batch), batch_size):
+                        chunk = batch[start:start + batch_size]
+                        params = []
+                        for article_id, user_id, ip_address, user_agent, read_count, read_at, _ in chunk:
+                            read_at = connection.ops.adapt_datetimefield_value(read_at)
+                            params.extend((article_id, user_id, ip_address, user_agent or None, read_count, read_at, read_at))
+                        cursor.execute(sql.format(values=', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(chunk))), params)
+                        for article_id, user_id, ip_address, read_count in cursor.fetchall():
+                            row = grouped[(article_id, user_id if user_id is not None else ip_address)]
+                            if read_count == row[4]:
+                                new_rows.append(row)
+            self._increment_article_counters(rows, new_rows)
+    
+    def _increment_article_counters(self, rows: List[tuple], new_rows: List[tuple]):
+        """
+        一条UPDATE语句用F()递增文章总阅读量，以及新增阅读记录带来的独立用户/IP数
+        
+        登录用户的新记录计入独立用户，匿名访问的新记录计入独立IP；登录用户的IP与匿名IP重复等偏差由定时对账校准
         """
-        更新数据库统计数据 - 使用数据库降级策略
+        increments = {'total_views': defaultdict(int), 'unique_users': defaultdict(int), 'unique_ips': defaultdict(int)}
+        for row in rows:
+            increments['total_views'][row[0]] += row[6]
+        for row in new_rows:
+            increments['unique_users' if row[1] is not None else 'unique_ips'][row[0]] += 1
+        
+        Article.objects.filter(id__in=increments['total_views']).update(**{
+            field: F(field) + Case(
+                *[When(id=article_id, then=Value(count)) for article_id, count in counts.items()],
+                default=Value(0)
+            )
+            for field, counts in increments.items() if counts
+        })
+    
+    def _upsert_reading_stat_fallback(self, article_id: int, user_id: Optional[int], ip_address: Optional[str],
+                                      user_agent: Optional[str], read_count: int, read_at: datetime):
+        """
+        不支持带条件冲突目标的数据库：先用F()递增，没有命中再插入，插入冲突时重试递增；返回是否新插入
         """
+        if user_id is not None:
+            lookup = {'article_id': article_id, 'user_id': user_id}
+        else:
+            lookup = {'article_id': article_id, 'user__isnull': True, 'ip_address': ip_address}
+        updates = {'read_count': F('read_count') + read_count, 'last_read_at': read_at}
+        if user_agent:
+            updates['user_agent'] = user_agent
+        if user_id is not None and ip_address:
+            updates['ip_address'] = ip_address
+        
+        if ReadingStats.objects.filter(**lookup).update(**updates):
+            return False
         try:
             with transaction.atomic():
-                # 获取或创建阅读统计记录
-                reading_stat, created = ReadingStats.objects.get_or_create(
+                ReadingStats.objects.create(
                     article_id=article_id,
-                    user=user,
+                    user_id=user_id,
                     ip_address=ip_address,
-                    defaults={
-                        'user_agent': user_agent,
-                        'read_count': 1
-                    }
+                    user_agent=user_agent or None,
+                    read_count=read_count
                 )
-                
-                # 如果记录已存在，增加阅读次数
-                if not created:
-                    reading_stat.read_count = F('read_count') + 1
-                    reading_stat.last_read_at = datetime.now()
-                    if user_agent:
-                        reading_stat.user_agent = user_agent
-                    reading_stat.save(update_fields=['read_count', 'last_read_at', 'user_agent'])
-                
-                return True
-                
+            return True
+        except IntegrityError:
+            ReadingStats.objects.filter(**lookup).update(**updates)
+            return False
+    
+    def _buffer_database_stats(self, article_id: int, user: User = None,
+                               ip_address: str = None, user_agent: str = None, amount: int = 1) -> bool:
+        """
+        将阅读事件写入写回缓冲
+        """
+        try:
+            flusher = get_flusher(self.flush_reading_buffer, self.buffer_service.flush_interval)
+            pending = self.buffer_service.push_event({
+                'article_id': article_id,
+                'user_id': user.id if user else None,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'count': 1,
+                'views': amount,
+                'read_at': timezone.now().isoformat()
+            })
+            
+            # 缓冲达到批量阈值，提前唤醒刷新线程
+            if pending >= self.buffer_service.batch_size:
+                flusher.wakeup()
+            
+            return True
+            
         except Exception as e:
-            raise DatabaseException(f"数据库更新失败: {str(e)}", ExceptionLevel.ERROR)
+            logger.warning(f"阅读事件写入缓冲失败，改为同步落库: {str(e)}")
+            return self._update_database_stats(article_id, user, ip_address, user_agent, amount)
+    
+    def flush_reading_buffer(self, max_batches: int = None) -> int:
+        """
+        将写回缓冲中的阅读事件合并后批量落库，返回处理的事件数
+        """
+        flushed = 0
+        batches = 0
+        
+        while max_batches is None or batches < max_batches:
+            events = self.buffer_service.drain_events()
+            if not events:
+                break
+            
+            # 跳过已删除的文章，避免外键错误让整批反复失败
+            article_ids = {event['article_id'] for event in events}
+            existing_ids = set(Article.objects.filter(id__in=article_ids).values_list('id', flat=True))
+            if existing_ids != article_ids:
+                logger.warning(f"丢弃已删除文章的阅读事件: {sorted(article_ids - existing_ids)}")
+                events = [event for event in events if event['article_id'] in existing_ids]
+            
+            grouped = self._coalesce_events(events)
+            try:
+                self._bulk_update_database_stats(grouped)
+            except Exception as e:
+                # 落库失败时放回缓冲等待下次刷新，失败次数过多的事件移入死信队列
+                self.buffer_service.retry_events(events)
+                logger.error(f"阅读缓冲批量落库失败: {str(e)}")
+                break
+            
+            flushed += len(events)
+            batches += 1
+        
+        if flushed:
+            logger.info(f"阅读缓冲落库完成: {flushed}条事件")
+        return flushed
+    
+    def _coalesce_events(self, events) -> Dict[tuple, Dict[str, Any]]:
+        """
+        合并阅读事件：登录用户按(文章, 用户)，匿名访问按(文章, IP)，与唯一约束保持一致
+        """
+        grouped = {}
+        for event in events:
+            user_id = event.get('user_id')
+            ip_address = event.get('ip_address')
+            key = (event['article_id'], user_id, ip_address if user_id is None else None)
+            item = grouped.setdefault(key, {
+                'count': 0, 'views': 0, 'user_agent': None, 'ip_address': None, 'last_read_at': None
+            })
+            item['count'] += event.get('count', 1)
+            # 旧版本事件没有views字段，count即为总阅读量增量
+            item['views'] += event.get('views', event.get('count', 1))
+            if event.get('user_agent'):
+                item['user_agent'] = event['user_agent']
+            read_at = datetime.fromisoformat(event['read_at']) if event.get('read_at') else timezone.now()
+            if item['last_read_at'] is None or read_at > item['last_read_at']:
+                item['last_read_at'] = read_at
+                if ip_address:
+                    item['ip_address'] = ip_address
+            elif item['ip_address'] is None:
+                item['ip_address'] = ip_address
+        return grouped
+    
+    def _bulk_update_database_stats(self, grouped: Dict[tuple, Dict[str, Any]]):
+        """
+        批量更新数据库统计：每组一条upsert，已存在的记录在数据库内递增
+        """
+        if not grouped:
+            return
+        
+        try:
+            self._upsert_reading_stats([
+                (article_id, user_id, item['ip_address'], item['user_agent'], item['count'], item['last_read_at'],
+                 item['views'])
+                for (article_id, user_id, _), item in grouped.items()
+            ])
+        except Exception as e:
+            raise DatabaseException(f"数据库批量更新失败: {str(e)}", ExceptionLevel.ERROR)
     
     def _get_database_stats(self, article_id: int) -> Dict[str, int]:
         """
-        从数据库获取统计数据
+        从数据库获取统计数据 - 独立用户/IP数从阅读记录精确统计
+        
+        总阅读量以文章行为准：采样计数时按N计入总阅读量，阅读记录只加1，不能再由记录求和
         """
         try:
-            # 总阅读次数
-            total_views = ReadingStats.objects.filter(
-                article_id=article_id
-            ).aggregate(
-                total=Sum('read_count')
-            )['total'] or 0
+            total_views = self._get_database_total_views(article_id)
             
             # 唯一用户数
             unique_users = ReadingStats.objects.filter(
@@ -241,11 +859,111 @@ class ReadingStatsService:
             return {
                 'total_views': total_views,
                 'unique_users': unique_users,
-                'unique_ips': unique_ips
+                'unique_ips': unique_ips,
+                'approximate': False
             }
             
         except Exception as e:
             raise DatabaseException(f"数据库查询失败: {str(e)}", ExceptionLevel.ERROR)
+    
+    def _get_database_total_views(self, article_id: int) -> int:
+        """
+        从文章行读取总阅读量
+        """
+        try:
+            return Article.objects.filter(
+                id=article_id
+            ).values_list('total_views', flat=True).first() or 0
+            
+        except Exception as e:
+            raise DatabaseException(f"数据库查询失败: {str(e)}", ExceptionLevel.ERROR)
+    
+    def _get_counter_stats(self, article_id: int) -> Dict[str, Any]:
+        """
+        从文章行读取反范式计数，独立用户/IP数截至上次对账
+        """
+        return self._get_many_counter_stats([article_id])[article_id]
+    
+    def _get_many_counter_stats(self, article_ids: List[int],
+                                articles: List[Article] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        批量读取文章行上的反范式计数，已传入的文章直接使用，其余一次主键查询
+        """
+        try:
+            wanted = set(article_ids)
+            counters = {
+                article.id: {
+                    'total_views': article.total_views,
+                    'unique_users': article.unique_users,
+                    'unique_ips': article.unique_ips
+                }
+                for article in articles or [] if article.id in wanted
+            }
+            remaining = [article_id for article_id in article_ids if article_id not in counters]
+            if remaining:
+                for row in Article.objects.filter(id__in=remaining).values(
+                    'id', 'total_views', 'unique_users', 'unique_ips'
+                ):
+                    counters[row.pop('id')] = row
+            
+            return {
+                article_id: {
+                    'total_views': 0,
+                    'unique_users': 0,
+                    'unique_ips': 0,
+                    **counters.get(article_id, {}),
+                    'approximate': True
+                }
+                for article_id in article_ids
+            }
+            
+        except Exception as e:
+            raise DatabaseException(f"数据库查询失败: {str(e)}", ExceptionLevel.ERROR)
+    
+    def reconcile_article_counters(self, article_ids: List[int] = None, include_total_views: bool = False,
+                                   batch_size: int = 1000) -> int:
+        """
+        用阅读记录校准文章上的独立用户/IP数，返回校准的文章数
+        
+        总阅读量以文章行为准（采样计数时按N递增，阅读记录只加1），include_total_views=True时
+        只把低于阅读记录之和的总阅读量补齐（回填或修复漏计），不会抹掉采样估计；每批一条带子查询的UPDATE语句
+        
+        校准后用文章行上的总阅读量直接覆盖已初始化的Redis计数器，落库失败等原因多计的缓存值也会被调低；
+        写回模式下先把缓冲中的阅读落库，使文章行包含缓存已计入的阅读
+        """
+        if self.buffer_service.is_enabled():
+            self.flush_reading_buffer()
+        
+        if article_ids is None:
+            article_ids = list(Article.objects.order_by('id').values_list('id', flat=True))
+        else:
+            article_ids = sorted(set(article_ids))
+        
+        stats = ReadingStats.objects.filter(article=OuterRef('pk')).order_by().values('article')
+        counters = {
+            'unique_users': Coalesce(
+                Subquery(stats.annotate(value=Count('user', distinct=True)).values('value')), 0
+            ),
+            'unique_ips': Coalesce(
+                Subquery(stats.annotate(value=Count('ip_address', distinct=True)).values('value')), 0
+            )
+        }
+        if include_total_views:
+            counters['total_views'] = Greatest(
+                F('total_views'),
+                Coalesce(Subquery(stats.annotate(value=Sum('read_count')).values('value')), 0)
+            )
+        
+        reconciled = 0
+        try:
+            for start in range(0, len(article_ids), batch_size):
+                batch = Article.objects.filter(id__in=article_ids[start:start + batch_size])
+                reconciled += batch.update(**counters)
+                self.cache_service.reset_article_totals(dict(batch.values_list('id', 'total_views')))
+        except Exception as e:
+            raise DatabaseException(f"文章计数对账失败: {str(e)}", ExceptionLevel.ERROR)
+        
+        return reconciled
 
 
 class CacheStatsService:
@@ -268,36 +986,105 @@ class CacheStatsService:
         """
         return self.monitor_service.get_daily_hit_rate(date)
     
-    def sync_cache_stats_to_db(self):
+    def get_hit_rate_range(self, date_from: str, date_to: str, granularity: str = 'day') -> Dict[str, Any]:
         """
-        同步缓存统计到数据库（定时任务）
+        获取日期范围内的缓存命中率 - 仍在Redis中的日期一次管道读取，其余日期一次查询CacheHitStats
+        
+        granularity为day（按天汇总）或hour（逐小时）
         """
+        if granularity not in ('day', 'hour'):
+            raise ValidationException(f"不支持的时间粒度: {granularity}")
         try:
-            current_time = datetime.now()
-            date = current_time.date()
-            hour = current_time.hour
-            
-            # 获取缓存统计
-            cache_stats = self.monitor_service.get_cache_hit_rate(str(date), hour)
-            
-            # 更新或创建数据库记录
-            cache_hit_stat, created = CacheHitStats.objects.get_or_create(
-                date=date,
-                hour=hour,
-                defaults={
-                    'total_requests': cache_stats['total_requests'],
-                    'cache_hits': cache_stats['cache_hits']
-                }
-            )
+            start = datetime.strptime(date_from, '%Y-%m-%d').date()
+            end = datetime.strptime(date_to, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValidationException("日期格式应为YYYY-MM-DD", ExceptionLevel.ERROR)
+        if start > end:
+            raise ValidationException("开始日期不能晚于结束日期", ExceptionLevel.ERROR)
+        if (end - start).days >= getattr(settings, 'CACHE_STATS_RANGE_MAX_DAYS', 366):
+            raise ValidationException("日期范围过大", ExceptionLevel.ERROR)
+        
+        dates = [str(start + timedelta(days=offset)) for offset in range((end - start).days + 1)]
+        
+        # 超过保留期的日期不会在Redis中
+        retention_start = str(datetime.now().date() - timedelta(
+            days=getattr(settings, 'CACHE_STATS_RETENTION_DAYS', 8)
+        ))
+        counts = self.monitor_service.get_many_daily_counts([date for date in dates if date >= retention_start])
+        
+        missing = [date for date in dates if date not in counts]
+        if missing:
+            missing_set = set(missing)
+            for date, hour, total_requests, cache_hits in CacheHitStats.objects.filter(
+                date__range=(missing[0], missing[-1])
+            ).values_list('date', 'hour', 'total_requests', 'cache_hits'):
+                if str(date) in missing_set:
+                    counts.setdefault(str(date), {})[hour] = (total_requests, cache_hits, 0)
+        
+        points = []
+        for date in dates:
+            hourly = counts.get(date, {})
+            if granularity == 'hour':
+                points.extend(
+                    self.monitor_service.build_hit_rate(date, hour, *hourly.get(hour, (0, 0, 0)))
+                    for hour in range(24)
+                )
+            else:
+                totals = [sum(values) for values in zip((0, 0, 0), *hourly.values())]
+                point = self.monitor_service.build_hit_rate(date, None, *totals)
+                point.pop('hour')
+                points.append(point)
+        
+        total_requests = sum(point['total_requests'] for point in points)
+        total_hits = sum(point['cache_hits'] for point in points)
+        return {
+            'from': dates[0],
+            'to': dates[-1],
+            'granularity': granularity,
+            'total_requests': total_requests,
+            'total_hits': total_hits,
+            'hit_rate': round((total_hits / total_requests) * 100, 2) if total_requests else 0,
+            'points': points
+        }
+    
+    def sync_cache_stats_to_db(self) -> bool:
+        """
+        同步缓存统计到数据库（定时任务）- 保留期内仍在Redis中的所有小时一次批量写入
+        
+        Redis中是各小时的累计值，写入时覆盖而不是累加，重复执行是幂等的，
+        漏掉的小时在下次同步时自动补齐
+        """
+        try:
+            if not self.monitor_service.is_available():
+                logger.warning("Redis不可用，跳过缓存统计同步")
+                return False
+            
+            today = datetime.now().date()
+            retention_days = getattr(settings, 'CACHE_STATS_RETENTION_DAYS', 8)
+            dates = [str(today - timedelta(days=offset)) for offset in range(retention_days + 1)]
+            counts = self.monitor_service.get_many_daily_counts(dates)
             
-            if not created:
-                cache_hit_stat.total_requests = cache_stats['total_requests']
-                cache_hit_stat.cache_hits = cache_stats['cache_hits']
-                cache_hit_stat.save()
+            rows = [
+                CacheHitStats(
+                    date=datetime.strptime(date, '%Y-%m-%d').date(),
+                    hour=hour,
+                    total_requests=total_requests,
+                    cache_hits=cache_hits
+                )
+                for date, hourly in counts.items()
+                for hour, (total_requests, cache_hits, _) in hourly.items()
+            ]
+            if rows:
+                CacheHitStats.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['date', 'hour'],
+                    update_fields=['total_requests', 'cache_hits']
+                )
             
-            logger.info(f"缓存统计同步成功: {date} {hour}时")
+            logger.info(f"缓存统计同步成功: {len(rows)}个小时")
             return True
             
         except Exception as e:
             logger.error(f"缓存统计同步失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
\ No newline at end of file
@@ -0,0 +1,234 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
+
+from .cache_service import CacheService
+from .reading_service import ReadingStatsService, CacheStatsService
+
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock(CacheService):
+    """
+    主节点锁 - 多个节点同时运行调度器时，只有持有锁的节点执行任务
+
+    锁带过期时间，持有者在每个任务前续期，任务执行期间由心跳线程续期；持有者退出或卡死时锁过期，其他节点接管
+    """
+
+    LOCK_KEY = "scheduler:leader"
+
+    # 只有持有者才能续期/释放，避免误操作其他节点的锁
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('expire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, ttl: int = 60):
+        super().__init__()
+        self.ttl = ttl
+        self.identity = f"{socket.gethostname()}:{os.getpid()}"
+
+    def acquire(self) -> bool:
+        """
+        获取或续期主节点锁，返回当前是否为主节点
+        """
+        try:
+            if not self.available:
+                return False
+            if self.redis_client.eval(self.RENEW_SCRIPT, 1, self.LOCK_KEY, self.identity, self.ttl):
+                return True
+            return bool(self.redis_client.set(self.LOCK_KEY, self.identity, nx=True, ex=self.ttl))
+        except Exception as e:
+            logger.error(f"获取调度器主节点锁失败: {e}")
+            return False
+
+    def release(self):
+        """
+        释放主节点锁（只释放自己持有的）
+        """
+        try:
+            self.redis_client.eval(self.RELEASE_SCRIPT, 1, self.LOCK_KEY, self.identity)
+        except Exception as e:
+            logger.error(f"释放调度器主节点锁失败: {e}")
+
+    @contextmanager
+    def keep_alive(self):
+        """
+        任务执行期间每ttl/3秒续期一次，任务耗时超过锁的TTL时其他节点也不会同时接管
+        """
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.ttl / 3):
+                if not self.acquire():
+                    logger.warning(f"任务执行期间调度器主节点锁续期失败: {self.identity}")
+
+        thread = threading.Thread(target=heartbeat, name='scheduler-leader-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+
+class JobRunStore(CacheService):
+    """
+    任务上次执行时间 - 与主节点锁一起保存在Redis中，cron逐次启动的--once进程和切换后的主节点都能按间隔执行
+    """
+
+    LAST_RUN_KEY = "scheduler:last_run"
+
+    def get_last_run(self, name: str) -> Optional[float]:
+        """
+        任务上次执行的Unix时间，没有记录或Redis不可用时返回None
+        """
+        try:
+            if not self.available:
+                return None
+            value = self.redis_client.hget(self.LAST_RUN_KEY, name)
+            return float(value) if value is not None else None
+        except Exception as e:
+            logger.error(f"读取定时任务执行时间失败 {name}: {e}")
+            return None
+
+    def set_last_run(self, name: str, timestamp: float) -> bool:
+        """
+        记录任务执行时间
+        """
+        try:
+            if not self.available:
+                return False
+            self.redis_client.hset(self.LAST_RUN_KEY, name, timestamp)
+            return True
+        except Exception as e:
+            logger.error(f"记录定时任务执行时间失败 {name}: {e}")
+            return False
+
+
+class PeriodicJob:
+    """
+    周期任务 - 上次执行时间优先读取Redis中的记录，Redis不可用时使用进程内的记录
+    """
+
+    def __init__(self, name: str, func: Callable[[], object], interval: float,
+                 store: Optional[JobRunStore] = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.store = store
+        self.last_run_at: Optional[float] = None
+
+    def is_due(self, now: float) -> bool:
+        last_run_at = self.last_run_at
+        if self.store is not None:
+            stored = self.store.get_last_run(self.name)
+            if stored is not None and (last_run_at is None or stored > last_run_at):
+                last_run_at = stored
+        return last_run_at is None or now - last_run_at >= self.interval
+
+    def run(self, now: float):
+        self.last_run_at = now
+        if self.store is not None:
+            self.store.set_last_run(self.name, now)
+        started = time.monotonic()
+        try:
+            result = self.func()
+            logger.info(f"定时任务完成 {self.name}: {result}，耗时{time.monotonic() - started:.3f}秒")
+        except Exception as e:
+            logger.error(f"定时任务失败 {self.name}: {e}")
+
+
+class PeriodicScheduler:
+    """
+    周期任务调度器 - 只在主节点上按各自的间隔执行任务，任务执行时间记录在Redis中
+    """
+
+    def __init__(self, jobs: List[PeriodicJob], tick: float = 5, lock: Optional[LeaderLock] = None,
+                 store: Optional[JobRunStore] = None):
+        self.jobs = jobs
+        self.tick = tick
+        self.lock = lock or LeaderLock(ttl=max(int(tick * 6), 30))
+        self.store = store or JobRunStore()
+        for job in jobs:
+            if job.store is None:
+                job.store = self.store
+        self.is_leader = False
+
+    def run_pending(self) -> Dict[str, bool]:
+        """
+        执行一轮：确认主节点身份后运行到期的任务，返回{任务名: 是否执行}
+        """
+        is_leader = self.lock.acquire()
+        if is_leader != self.is_leader:
+            logger.info(f"调度器{'成为' if is_leader else '不再是'}主节点: {self.lock.identity}")
+            self.is_leader = is_leader
+        if not is_leader:
+            return {job.name: False for job in self.jobs}
+
+        # 执行时间需要跨进程比较，使用Unix时间
+        now = time.time()
+        executed = {job.name: False for job in self.jobs}
+        for job in self.jobs:
+            if not job.is_due(now):
+                continue
+            # 前一个任务结束后重新续期，失去主节点身份后不再执行剩余任务
+            if any(executed.values()) and not self.lock.acquire():
+                logger.info(f"调度器不再是主节点: {self.lock.identity}")
+                self.is_leader = False
+                break
+            with self.lock.keep_alive():
+                job.run(now)
+            executed[job.name] = True
+        return executed
+
+    def run_forever(self):
+        """
+        循环执行直到进程退出，退出时释放主节点锁
+        """
+        try:
+            while True:
+                self.run_pending()
+                time.sleep(self.tick)
+        finally:
+            if self.is_leader:
+                self.lock.release()
+
+
+def get_default_jobs() -> List[PeriodicJob]:
+    """
+    内置的周期任务，间隔可在settings中配置
+    """
+    reading_service = ReadingStatsService()
+    cache_stats_service = CacheStatsService()
+    return [
+        PeriodicJob(
+            'sync_cache_stats',
+            cache_stats_service.sync_cache_stats_to_db,
+            getattr(settings, 'SCHEDULER_CACHE_STATS_SYNC_INTERVAL', 3600)
+        ),
+        PeriodicJob(
+            'flush_view_rollups',
+            reading_service.flush_view_rollups,
+            getattr(settings, 'SCHEDULER_VIEW_ROLLUP_INTERVAL', 300)
+        ),
+        PeriodicJob(
+            'reconcile_article_counters',
+            reading_service.reconcile_article_counters,
+            getattr(settings, 'SCHEDULER_RECONCILE_INTERVAL', 3600)
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Article
+from .services.cache_service import ReadingCacheService
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_cache(sender, instance, **kwargs):
+    """
+    文章保存或删除后，通知所有进程清除L1缓存
+    """
+    ReadingCacheService().invalidate_article(instance.id)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def remove_unpublished_from_leaderboards(sender, instance, **kwargs):
+    """
+    文章删除或取消发布后，从热门文章排行榜移除；发布（含重新发布）后按数据库中的总阅读量放回总榜
+    """
+    if kwargs.get('signal') is post_delete or not instance.is_published:
+        ReadingCacheService().remove_from_leaderboards(instance.id)
+        return
+    
+    # 保存时内存中的total_views可能已过期，以数据库为准
+    total_views = Article.objects.filter(id=instance.id).values_list('total_views', flat=True).first()
+    if total_views:
+        ReadingCacheService().restore_to_leaderboard(instance.id, total_views)
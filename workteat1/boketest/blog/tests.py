@@ -1,3 +1,609 @@
+import base64
+import re
+import threading
+import time
+from unittest import mock, skip, skipUnless
+
+import redis
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+
+from .models import Article, ArticleViewRollup, ReadingStats
+from .services.cache_service import BreakerRedis, CacheService, CircuitBreaker, ReadingCacheService
+from .services.dashboard_service import DashboardService
+from .services.local_cache import get_local_cache
+from .services.reading_service import ReadingStatsService
+from .services.scheduler import PeriodicJob, PeriodicScheduler
+
+try:
+    import fakeredis
+except ImportError:  # 可选依赖，未安装时跳过需要Redis的测试
+    fakeredis = None
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN仅适用于SQLite')
+class ReadingStatsIndexTests(TestCase):
+    """
+    阅读统计查询必须命中索引，不能退化为全表扫描
+    """
+
+    TABLE_ACCESS = re.compile(r'\b(SCAN|SEARCH) (?:TABLE )?"?(\w+)"?( USING (?:COVERING )?INDEX)?')
+    # 子查询中的阅读记录表以别名（如U0）出现
+    TABLE_ALIAS = re.compile(r'"blog_readingstats" (?:AS )?"?([TU]\d+)"?')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader')
+        cls.article = Article.objects.create(title='标题', content='内容', author=cls.user, is_published=True)
+        ReadingStats.objects.create(article=cls.article, user=cls.user, ip_address='10.0.0.1', read_count=3)
+        ReadingStats.objects.create(article=cls.article, ip_address='10.0.0.2', read_count=1)
+
+    def assertIndexSearch(self, sql, params=(), allow_index_scan=False):
+        """
+        每次访问阅读记录表都必须是索引SEARCH；allow_index_scan时允许按索引顺序SCAN（ORDER BY ... LIMIT）
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        names = {'blog_readingstats', *self.TABLE_ALIAS.findall(sql)}
+        accesses = [(operation, using_index) for operation, name, using_index in self.TABLE_ACCESS.findall(plan)
+                    if name in names]
+        self.assertTrue(accesses, f'{sql}\n{plan}')
+        for operation, using_index in accesses:
+            if operation == 'SCAN':
+                self.assertTrue(allow_index_scan and using_index, f'{sql}\n{plan}')
+
+    def assertQueriesUseIndex(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        queries = [query['sql'] for query in ctx.captured_queries if 'blog_readingstats' in query['sql']]
+        self.assertTrue(queries)
+        for sql in queries:
+            self.assertIndexSearch(sql)
+
+    def test_database_stats_queries(self):
+        service = ReadingStatsService()
+        self.assertQueriesUseIndex(lambda: service._get_database_stats(self.article.id))
+        self.assertQueriesUseIndex(lambda: service.reconcile_article_counters([self.article.id], True))
+
+    def test_user_reading_stats_query(self):
+        queryset = ReadingStats.objects.filter(article_id=self.article.id, user_id=self.user.id)
+        self.assertIndexSearch(*queryset.query.sql_with_params())
+
+    def test_admin_ordering_query(self):
+        model_admin = site._registry[ReadingStats]
+        queryset = ReadingStats.objects.order_by(*model_admin.ordering)[:100]
+        self.assertIndexSearch(*queryset.query.sql_with_params(), allow_index_scan=True)
+
+
+class ReadingStatsUpsertTests(TestCase):
+    """
+    阅读记录upsert：每个(文章, 用户)或(文章, IP)只有一行，文章计数在同一事务内递增
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader')
+        cls.article = Article.objects.create(title='标题', content='内容', author=cls.user, is_published=True)
+
+    def setUp(self):
+        self.service = ReadingStatsService()
+
+    def read(self, user=None, ip_address=None, amount=1):
+        self.assertTrue(self.service._update_database_stats(self.article.id, user, ip_address, 'agent', amount))
+
+    def test_anonymous_reads_share_one_row_per_ip(self):
+        for _ in range(3):
+            self.read(ip_address='10.0.0.1')
+        self.read(ip_address='10.0.0.2')
+
+        rows = ReadingStats.objects.filter(article=self.article, user__isnull=True).order_by('ip_address')
+        self.assertEqual([(row.ip_address, row.read_count) for row in rows], [('10.0.0.1', 3), ('10.0.0.2', 1)])
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.total_views, self.article.unique_ips), (4, 2))
+
+    def test_user_row_accumulates_and_keeps_latest_ip(self):
+        self.read(user=self.user, ip_address='10.0.0.1')
+        self.read(user=self.user, ip_address='10.0.0.9')
+
+        row = ReadingStats.objects.get(article=self.article)
+        self.assertEqual((row.user_id, row.read_count, row.ip_address), (self.user.id, 2, '10.0.0.9'))
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.total_views, self.article.unique_users), (2, 1))
+
+    def test_sampled_read_counts_once_per_visitor(self):
+        self.read(ip_address='10.0.0.1', amount=5)
+
+        self.assertEqual(ReadingStats.objects.get(article=self.article).read_count, 1)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.total_views, 5)
+
+    def test_reconcile_keeps_sampled_total_views(self):
+        self.read(ip_address='10.0.0.1', amount=5)
+        self.service.reconcile_article_counters([self.article.id], include_total_views=True)
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.total_views, 5)
+        self.assertEqual(self.service._get_database_stats(self.article.id)['total_views'], 5)
+
+    def test_article_counters_share_the_transaction(self):
+        with mock.patch.object(self.service, '_increment_article_counters', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                self.service._upsert_reading_stats([
+                    (self.article.id, None, '10.0.0.1', 'agent', 1, timezone.now(), 1)
+                ])
+
+        self.assertFalse(ReadingStats.objects.filter(article=self.article).exists())
+
+    def test_batch_uses_one_statement_per_conflict_target(self):
+        now = timezone.now()
+        rows = [(self.article.id, None, f'10.0.1.{i}', 'agent', 2, now, 2) for i in range(20)]
+        rows.append((self.article.id, self.user.id, '10.0.0.1', 'agent', 3, now, 3))
+        self.service._upsert_reading_stats(rows[:5])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.service._upsert_reading_stats(rows)
+        inserts = [query for query in ctx.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.total_views, self.article.unique_ips, self.article.unique_users), (53, 20, 1))
+
+
+class ReadingStatsFallbackUpsertTests(ReadingStatsUpsertTests):
+    """
+    不支持带条件冲突目标的数据库走先递增后插入的降级路径，结果与upsert一致
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @skip('降级路径逐行写入')
+    def test_batch_uses_one_statement_per_conflict_target(self):
+        pass
+
+
+@skipUnless(fakeredis, '需要安装fakeredis')
+class FakeRedisTestCase(TestCase):
+    """
+    用fakeredis替换共享的Redis客户端，每个测试一个独立的内存服务器
+    """
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = self.make_client(self.server)
+        patcher = mock.patch('blog.services.cache_service.get_redis_client', side_effect=lambda: self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_local_cache().clear()
+        self.addCleanup(get_local_cache().clear)
+        for name in ('_record_view_script', '_merge_counters_script', '_reset_counters_script',
+                     '_scripting_supported'):
+            patcher = mock.patch.object(ReadingCacheService, name, getattr(ReadingCacheService, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def make_client(server, circuit_breaker=None):
+        pool = redis.ConnectionPool(connection_class=fakeredis.FakeConnection, server=server, decode_responses=True)
+        return BreakerRedis(circuit_breaker or CircuitBreaker(), connection_pool=pool)
+
+    @staticmethod
+    def dump(server):
+        """
+        服务器上全部键的类型、值和过期时间（按字节读取，阅读次数哈希的字段是二进制）
+        """
+        client = fakeredis.FakeStrictRedis(server=server)
+        readers = {
+            b'string': client.get,
+            b'hash': client.hgetall,
+            b'set': client.smembers,
+            b'zset': lambda key: client.zrange(key, 0, -1, withscores=True),
+        }
+        return {key: (client.type(key), readers[client.type(key)](key), client.ttl(key)) for key in client.keys()}
+
+
+class CounterCodecTests(FakeRedisTestCase):
+    """
+    按int编码的计数器键：set写入的值不带类型标记，INCR后仍能按整数读取
+    """
+
+    def test_set_incr_get(self):
+        service = DashboardService()
+        key = service.SNAPSHOT_VERSION_KEY
+        self.assertTrue(service.set(key, 41))
+        self.assertEqual(service.incr(key), 42)
+        self.assertEqual(service.get(key), 42)
+
+    def test_json_value_cannot_be_incremented(self):
+        service = DashboardService()
+        self.assertTrue(service.set('dashboard_counter', 41))
+        self.assertEqual(service.incr('dashboard_counter'), 0)
+        self.assertEqual(service.get('dashboard_counter'), 41)
+
+
+class RecordArticleViewTests(FakeRedisTestCase):
+    """
+    Lua脚本和MULTI管道两条阅读计数路径写入完全相同的键和值
+    """
+
+    def record_views(self, scripting):
+        self.server = fakeredis.FakeServer()
+        self.redis = self.make_client(self.server)
+        get_local_cache().clear()
+        ReadingCacheService._record_view_script = None
+        ReadingCacheService._scripting_supported = scripting
+        service = ReadingCacheService()
+
+        hydrated = [service.record_article_view(1, user_id=7, ip_address='10.0.0.1')]
+        with mock.patch('blog.services.cache_service.time.time', return_value=round(time.time())):
+            hydrated.append(service.update_article_stats(1, {'total_views': 10}))
+        hydrated += [
+            service.record_article_view(1, user_id=7, ip_address='10.0.0.1'),
+            service.record_article_view(1, ip_address='::ffff:10.0.0.2', amount=3),
+            service.record_article_view(2, ip_address='2001:db8::1'),
+        ]
+        self.assertEqual(ReadingCacheService._scripting_supported, scripting)
+        self.assertEqual(ReadingCacheService._record_view_script is not None, scripting)
+        return hydrated, self.dump(self.server), service
+
+    def test_script_and_pipeline_write_same_state(self):
+        script_hydrated, script_state, _ = self.record_views(scripting=True)
+        pipeline_hydrated, pipeline_state, service = self.record_views(scripting=False)
+
+        self.assertEqual(script_hydrated, [False, True, True, True, False])
+        self.assertEqual(pipeline_hydrated, script_hydrated)
+        self.assertEqual(pipeline_state.keys(), script_state.keys())
+        for key, (key_type, value, ttl) in script_state.items():
+            self.assertEqual(pipeline_state[key][:2], (key_type, value), key)
+            self.assertAlmostEqual(pipeline_state[key][2], ttl, delta=1, msg=key)
+
+        self.assertEqual(service.get_reader_count(1, user_id=7), 2)
+        self.assertEqual(service.get_reader_count(1, ip_address='10.0.0.2'), 1)
+        self.assertEqual(int(self.redis.hget('article_counters:1', 'total_views')), 14)
+
+
+class CircuitBreakerTests(FakeRedisTestCase):
+    """
+    熔断器状态机：closed -> open -> half_open -> closed/open，熔断期间快速失败不访问Redis
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker(failure_threshold=2, probe_interval=5.0)
+        self.redis = self.make_client(self.server, self.breaker)
+        self.service = CacheService()
+
+    def elapse_probe_interval(self):
+        self.breaker.opened_at -= self.breaker.probe_interval
+
+    def test_opens_after_consecutive_failures(self):
+        self.server.connected = False
+        self.assertEqual(self.service.get('key', 'default'), 'default')
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(self.service.set('key', 1))
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        # 熔断期间不再访问Redis，恢复连接也要等到探测间隔之后
+        self.server.connected = True
+        with mock.patch.object(self.redis, 'ping') as ping:
+            self.assertFalse(self.service.available)
+        ping.assert_not_called()
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.service.set('key', 1))
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.elapse_probe_interval()
+        opened_at = self.breaker.opened_at
+
+        self.server.connected = False
+        self.assertFalse(self.service.available)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertGreater(self.breaker.opened_at, opened_at)
+        self.assertFalse(self.service.available)
+
+    def test_successful_probe_closes(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.elapse_probe_interval()
+
+        self.assertTrue(self.service.available)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+        self.assertTrue(self.service.set('key', 1))
+        self.assertEqual(self.service.get('key'), 1)
+
+    def test_only_one_caller_probes(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.elapse_probe_interval()
+        others = []
+
+        def probe():
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            others.append(self.breaker.allow_request(mock.Mock()))
+
+        self.assertTrue(self.breaker.allow_request(probe))
+        self.assertEqual(others, [False])
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class ArticleListCursorTests(FakeRedisTestCase):
+    """
+    文章列表游标分页：按(created_at, id)翻页不重复不遗漏，无效游标返回400
+    """
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create(username='author')
+        created_at = timezone.now().replace(microsecond=123456)
+        self.article_ids = []
+        for index in range(5):
+            article = Article.objects.create(title=f'标题{index}', content='内容', author=user, is_published=True)
+            self.article_ids.append(article.id)
+        # 前三篇同一时间创建，靠id区分先后
+        Article.objects.filter(id__in=self.article_ids[:3]).update(created_at=created_at)
+        Article.objects.filter(id__in=self.article_ids[3:]).update(created_at=created_at + timedelta(hours=1))
+
+    def get_page(self, **params):
+        return self.client.get(reverse('blog:article_list'), {'format': 'json', 'page_size': 2, **params})
+
+    def test_pages_round_trip(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            data = self.get_page(**({'cursor': cursor} if cursor else {})).json()['data']
+            seen += [article['id'] for article in data['articles']]
+            pages += 1
+            cursor = data['next_cursor']
+            self.assertEqual(data['has_next'], cursor is not None)
+            if not cursor:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, self.article_ids[3:][::-1] + self.article_ids[:3][::-1])
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64!', base64.urlsafe_b64encode(b'2024-01-01T00:00:00|x').decode('ascii')):
+            response = self.get_page(cursor=cursor)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+
+
+class ArticleStatsStampedeTests(FakeRedisTestCase):
+    """
+    统计重算防击穿：未命中和提前刷新都只有拿到租约的请求访问数据库
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.service = ReadingStatsService()
+        self.cache = ReadingCacheService()
+        user = User.objects.create(username='author')
+        self.article = Article.objects.create(title='标题', content='内容', author=user, is_published=True)
+        Article.objects.filter(id=self.article.id).update(total_views=8)
+        self.lease_key = self.cache.STATS_LEASE_KEY.format(article_id=self.article.id)
+
+    def test_miss_waits_for_lease_holder(self):
+        self.redis.set(self.lease_key, 1)
+        holder = threading.Timer(0.05, self.cache.update_article_stats, (self.article.id, {'total_views': 42}))
+        holder.start()
+        self.addCleanup(holder.join)
+
+        with mock.patch.object(self.service, '_get_counter_stats') as counter_stats:
+            stats = self.service.get_article_stats(self.article.id)
+
+        counter_stats.assert_not_called()
+        self.assertEqual(stats['total_views'], 42)
+
+    def test_miss_falls_back_to_database_after_wait(self):
+        self.redis.set(self.lease_key, 1)
+        self.assertEqual(self.service.get_article_stats(self.article.id)['total_views'], 8)
+        # 租约属于其他请求，不能释放
+        self.assertTrue(self.redis.exists(self.lease_key))
+
+    def test_stale_entry_refreshed_by_lease_holder_only(self):
+        self.cache.update_article_stats(self.article.id, {'total_views': 5})
+        self.redis.hset(self.cache.ARTICLE_COUNTERS_KEY.format(article_id=self.article.id),
+                        'hydrated_at', time.time() - 7200)
+        get_local_cache().clear()
+
+        self.redis.set(self.lease_key, 1)
+        with mock.patch.object(self.service, '_refresh_article_cache_stats') as refresh:
+            self.assertEqual(self.service.get_article_stats(self.article.id)['total_views'], 5)
+        refresh.assert_not_called()
+
+        self.redis.delete(self.lease_key)
+        get_local_cache().clear()
+        self.assertEqual(self.service.get_article_stats(self.article.id)['total_views'], 8)
+        self.assertFalse(self.redis.exists(self.lease_key))
+
+    def test_xfetch_refreshes_early_for_slow_recomputation(self):
+        now = time.time()
+        with mock.patch('blog.services.cache_service.random.random', return_value=0.5):
+            self.assertFalse(self.cache._refresh_due(now - 3000, 3600, compute_time=1.0))
+            self.assertTrue(self.cache._refresh_due(now - 3000, 3600, compute_time=1000.0))
+            self.assertTrue(self.cache._refresh_due(now - 3601, 3600, compute_time=0.0))
+
+
+class ReconcileCountersTests(FakeRedisTestCase):
+    """
+    对账后用文章行上的总阅读量覆盖已初始化的Redis计数器，多计的值也会被调低
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.service = ReadingStatsService()
+        self.cache = self.service.cache_service
+        user = User.objects.create(username='author')
+        self.article = Article.objects.create(title='标题', content='内容', author=user, is_published=True)
+        self.cold = Article.objects.create(title='其他', content='内容', author=user, is_published=True)
+        Article.objects.filter(id__in=[self.article.id, self.cold.id]).update(total_views=30)
+        self.cache.update_article_stats(self.article.id, {'total_views': 50})
+
+    def cached_total(self, article):
+        return self.redis.hget(self.cache.ARTICLE_COUNTERS_KEY.format(article_id=article.id), 'total_views')
+
+    def test_reconcile_overwrites_over_count(self):
+        self.service.reconcile_article_counters()
+        self.assertEqual(self.cached_total(self.article), '30')
+        self.assertEqual(self.service.get_article_stats(self.article.id)['total_views'], 30)
+        self.assertIsNone(self.cached_total(self.cold))
+
+    def test_merge_never_lowers_counter(self):
+        self.cache.update_article_stats(self.article.id, {'total_views': 30}, merge=True)
+        self.assertEqual(self.cached_total(self.article), '50')
+
+    def test_pipeline_fallback_drops_counter(self):
+        ReadingCacheService._scripting_supported = False
+        self.service.reconcile_article_counters([self.article.id])
+        self.assertIsNone(self.cached_total(self.article))
+
+
+class DashboardSnapshotTests(FakeRedisTestCase):
+    """
+    快照缺失时同一窗口只有拿到租约的请求计算，其余请求等待其结果
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('blog.services.dashboard_service.get_refresher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build(self, window):
+        time.sleep(0.2)
+        return {'window': window}
+
+    def test_concurrent_misses_build_once(self):
+        with mock.patch.object(DashboardService, 'build_dashboard_data', autospec=True,
+                               side_effect=lambda service, window: self.build(window)) as build:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(DashboardService().get_dashboard('all')))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual({result['snapshot']['version'] for result in results}, {1})
+
+    def test_lease_holder_timeout_serves_previous_snapshot(self):
+        service = DashboardService()
+        with mock.patch.object(DashboardService, 'build_dashboard_data', return_value={'window': 'all'}):
+            previous = service.get_dashboard('all')
+        self.redis.set(service.SNAPSHOT_BUILD_LEASE_KEY.format(window='all'), 1)
+
+        with self.settings(DASHBOARD_SNAPSHOT_LEASE_WAIT=0.1), \
+                mock.patch.object(DashboardService, 'build_dashboard_data') as build:
+            snapshot = service.get_dashboard('all', fresh=True)
+
+        build.assert_not_called()
+        self.assertEqual(snapshot['snapshot']['version'], previous['snapshot']['version'])
+
+
+class LeaderboardTests(FakeRedisTestCase):
+    """
+    热门文章排行榜：重新发布后恢复总榜分数，Redis不可用时日榜/小时榜按小时汇总统计
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.service = ReadingStatsService()
+        user = User.objects.create(username='author')
+        self.article = Article.objects.create(title='标题', content='内容', author=user, is_published=True)
+        self.other = Article.objects.create(title='其他', content='内容', author=user, is_published=True)
+        Article.objects.filter(id=self.article.id).update(total_views=30)
+        Article.objects.filter(id=self.other.id).update(total_views=10)
+        self.article.refresh_from_db()
+
+    def test_republished_article_keeps_all_time_score(self):
+        self.assertEqual(self.service.get_top_articles('all')[0], {'article_id': self.article.id, 'views': 30})
+
+        self.article.is_published = False
+        self.article.save()
+        self.assertEqual([item['article_id'] for item in self.service.get_top_articles('all')], [self.other.id])
+
+        self.article.is_published = True
+        self.article.save()
+        self.assertEqual(self.service.get_top_articles('all')[0], {'article_id': self.article.id, 'views': 30})
+
+    def test_windows_fall_back_to_rollups(self):
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        ArticleViewRollup.objects.create(article=self.other, bucket_start=now, views=5)
+        ArticleViewRollup.objects.create(article=self.article, bucket_start=now - timedelta(hours=3), views=4)
+        ArticleViewRollup.objects.create(article=self.article, bucket_start=now - timedelta(days=2), views=100)
+
+        with mock.patch.object(self.service.cache_service, 'get_leaderboard', return_value=None):
+            hour = self.service.get_top_articles('hour')
+            day = self.service.get_top_articles('day')
+            all_time = self.service.get_top_articles('all')
+
+        self.assertEqual(hour, [{'article_id': self.other.id, 'views': 5}])
+        if timezone.localtime(now - timedelta(hours=3)).date() == timezone.localdate():
+            self.assertEqual(day, [{'article_id': self.other.id, 'views': 5},
+                                   {'article_id': self.article.id, 'views': 4}])
+        self.assertEqual(all_time[0], {'article_id': self.article.id, 'views': 30})
+
+
+class ArticleTimeseriesTests(FakeRedisTestCase):
+    """
+    阅读趋势：按天的桶从本地0点开始，正好days个
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.service = ReadingStatsService()
+        user = User.objects.create(username='author')
+        self.article = Article.objects.create(title='标题', content='内容', author=user, is_published=True)
+
+    def test_day_buckets_start_at_local_midnight(self):
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        for bucket_start, views in ((today, 3), (today - timedelta(hours=1), 2), (today - timedelta(days=1), 4)):
+            ArticleViewRollup.objects.create(article=self.article, bucket_start=bucket_start, views=views)
+        ArticleViewRollup.objects.create(article=self.article, bucket_start=today - timedelta(days=2), views=50)
+
+        points = self.service.get_article_timeseries(self.article.id, 'day', days=2)['points']
+
+        self.assertEqual([point['bucket_start'] for point in points],
+                         [(today - timedelta(days=1)).isoformat(), today.isoformat()])
+        self.assertEqual([point['views'] for point in points], [6, 3])
+
+    def test_hour_buckets(self):
+        points = self.service.get_article_timeseries(self.article.id, 'hour', days=1)['points']
+        self.assertEqual(len(points), 24)
+
+
+class PeriodicSchedulerTests(FakeRedisTestCase):
+    """
+    周期任务的执行时间保存在Redis中，逐次启动的调度器进程按间隔执行
+    """
+
+    def run_once(self, func):
+        scheduler = PeriodicScheduler([PeriodicJob('job', func, 3600)])
+        executed = scheduler.run_pending()
+        scheduler.lock.release()
+        return executed
+
+    def test_interval_survives_new_process(self):
+        func = mock.Mock(return_value=None)
+        self.assertEqual(self.run_once(func), {'job': True})
+        self.assertEqual(self.run_once(func), {'job': False})
+        self.assertEqual(func.call_count, 1)
 
-# Create your tests here.
+        self.redis.hset('scheduler:last_run', 'job', 0)
+        self.assertEqual(self.run_once(func), {'job': True})
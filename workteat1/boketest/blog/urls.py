@@ -9,8 +9,10 @@ urlpatterns = [
     path('article/<int:article_id>/', views.ArticleDetailView.as_view(), name='article_detail'),
     
     # API接口
+    path('api/article/<int:article_id>/view/', views.ArticleViewBeaconView.as_view(), name='article_view_beacon'),
     path('api/article/<int:article_id>/stats/', views.ArticleStatsView.as_view(), name='article_stats_api'),
     path('api/article/<int:article_id>/user-stats/', views.UserReadingStatsView.as_view(), name='user_reading_stats_api'),
+    path('api/article/<int:article_id>/timeseries/', views.ArticleTimeseriesView.as_view(), name='article_timeseries_api'),
     
     # 缓存监控
     path('api/cache-monitor/', views.CacheMonitorView.as_view(), name='cache_monitor_api'),
@@ -1,6 +1,12 @@
+import base64
 import json
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from datetime import datetime
+from django.shortcuts import render
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.conf import settings
+from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -10,12 +16,17 @@ from django.contrib.auth.models import User
 
 from .models import Article, ReadingStats, CacheHitStats
 from .services.reading_service import ReadingStatsService, CacheStatsService
-from .services.exceptions import ApiResponseHandler
+from .services.dashboard_service import DashboardService
+from .services.cache_service import ReadingCacheService
+from .services.page_cache_service import ArticlePageCacheService
+from .services.exceptions import ApiResponseHandler, ValidationException, ExceptionLevel
 
 
 # 创建服务实例
 reading_service = ReadingStatsService()
 cache_stats_service = CacheStatsService()
+dashboard_service = DashboardService()
+page_cache_service = ArticlePageCacheService()
 
 
 class ArticleDetailView(View):
@@ -28,8 +39,17 @@ class ArticleDetailView(View):
         获取文章详情并记录阅读
         """
         try:
-            # 获取文章
-            article = get_object_or_404(Article, id=article_id, is_published=True)
+            # 获取文章（优先读L1缓存）
+            article = reading_service.get_published_article(article_id)
+            if article is None:
+                raise Http404("文章不存在")
+            
+            is_json = request.headers.get('Content-Type') == 'application/json' or \
+                request.GET.get('format') == 'json'
+            
+            # 页面缓存模式：匿名访问直接返回缓存的页面，阅读量由页面POST到beacon接口单独记录
+            if page_cache_service.is_enabled() and not request.user.is_authenticated:
+                return self._cached_page_response(request, article, is_json)
             
             # 获取用户信息和IP
             user = request.user if request.user.is_authenticated else None
@@ -55,13 +75,13 @@ class ArticleDetailView(View):
                 'reading_stats': reading_result.get('stats', {}),
                 'cache_status': {
                     'cache_updated': reading_result.get('cache_updated', False),
-                    'database_updated': reading_result.get('database_updated', False)
+                    'database_updated': reading_result.get('database_updated', False),
+                    'deduplicated': reading_result.get('deduplicated', False)
                 }
             }
             
             # 判断是否为API请求
-            if request.headers.get('Content-Type') == 'application/json' or \
-               request.GET.get('format') == 'json':
+            if is_json:
                 return ApiResponseHandler.success_response(article_data, "文章获取成功")
             else:
                 # 返回HTML页面
@@ -74,7 +94,48 @@ class ArticleDetailView(View):
         except Exception as e:
             return ApiResponseHandler.handle_exception_response(e, f"获取文章详情-{article_id}")
     
-    def _get_client_ip(self, request):
+    def _cached_page_response(self, request, article, is_json):
+        """
+        从页面缓存返回文章页，未命中时渲染并缓存（不记录阅读），响应头X-Page-Cache标明是否命中
+        """
+        fmt = 'json' if is_json else 'html'
+        page = page_cache_service.get_page(article, fmt)
+        cache_hit = page is not None
+        if page is None:
+            stats = reading_service.get_article_stats(article.id)
+            beacon_url = reverse('blog:article_view_beacon', args=[article.id])
+            if is_json:
+                page = {
+                    'id': article.id,
+                    'title': article.title,
+                    'content': article.content,
+                    'author': article.author.username,
+                    'created_at': article.created_at.isoformat(),
+                    'updated_at': article.updated_at.isoformat(),
+                    'reading_stats': stats,
+                    'cache_status': {
+                        'page_cache': True,
+                        'view_beacon': beacon_url
+                    }
+                }
+            else:
+                page = render_to_string('blog/article_detail.html', {
+                    'article': article,
+                    'reading_stats': stats,
+                    'cache_status': False,
+                    'view_beacon_url': beacon_url
+                }, request=request)
+            page_cache_service.set_page(article, fmt, page)
+        
+        if is_json:
+            response = ApiResponseHandler.success_response(page, "文章获取成功")
+        else:
+            response = HttpResponse(page)
+        response['X-Page-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
+    
+    @staticmethod
+    def _get_client_ip(request):
         """获取客户端IP地址"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -84,6 +145,36 @@ class ArticleDetailView(View):
         return ip
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class ArticleViewBeaconView(View):
+    """
+    阅读计数接口 - 页面缓存模式下由页面通过navigator.sendBeacon上报，只做计数不返回统计
+    """
+    
+    def post(self, request, article_id):
+        """
+        记录一次阅读
+        """
+        try:
+            user = request.user if request.user.is_authenticated else None
+            reading_result = reading_service.record_reading(
+                article_id=article_id,
+                user=user,
+                ip_address=ArticleDetailView._get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                with_stats=False
+            )
+            if not reading_result.get('success'):
+                return ApiResponseHandler.error_response(reading_result)
+            return ApiResponseHandler.success_response({
+                'article_id': article_id,
+                'deduplicated': reading_result['deduplicated'],
+                'sampled': reading_result['sampled']
+            }, "阅读已记录")
+        except Exception as e:
+            return ApiResponseHandler.handle_exception_response(e, f"记录阅读-{article_id}")
+
+
 class ArticleStatsView(View):
     """
     文章统计数据API
@@ -91,15 +182,37 @@ class ArticleStatsView(View):
     
     def get(self, request, article_id):
         """
-        获取文章阅读统计
+        获取文章阅读统计（exact=1时独立用户/IP数从数据库精确统计）
         """
         try:
-            stats = reading_service.get_article_stats(article_id)
+            exact = request.GET.get('exact') in ('1', 'true')
+            stats = reading_service.get_article_stats(article_id, exact=exact)
             return ApiResponseHandler.success_response(stats, "统计数据获取成功")
         except Exception as e:
             return ApiResponseHandler.handle_exception_response(e, f"获取文章统计-{article_id}")
 
 
+class ArticleTimeseriesView(View):
+    """
+    文章阅读趋势API
+    """
+    
+    def get(self, request, article_id):
+        """
+        获取文章按小时或按天的阅读量（granularity=hour|day，days为最近天数）
+        """
+        try:
+            try:
+                days = int(request.GET.get('days', 7))
+            except ValueError:
+                raise ValidationException("days必须是整数", ExceptionLevel.ERROR)
+            granularity = request.GET.get('granularity', 'hour')
+            timeseries = reading_service.get_article_timeseries(article_id, granularity, days)
+            return ApiResponseHandler.success_response(timeseries, "阅读趋势获取成功")
+        except Exception as e:
+            return ApiResponseHandler.handle_exception_response(e, f"获取阅读趋势-{article_id}")
+
+
 class UserReadingStatsView(View):
     """
     用户阅读统计API
@@ -127,11 +240,15 @@ class CacheMonitorView(View):
         获取缓存命中率统计
         """
         try:
-            monitor_type = request.GET.get('type', 'current')  # current, daily
+            monitor_type = request.GET.get('type', 'current')  # current, daily, range
             date = request.GET.get('date')  # YYYY-MM-DD
             
             if monitor_type == 'daily':
                 stats = cache_stats_service.get_daily_stats(date)
+            elif monitor_type == 'range':
+                stats = cache_stats_service.get_hit_rate_range(
+                    request.GET.get('from'), request.GET.get('to'), request.GET.get('granularity', 'day')
+                )
             else:
                 stats = cache_stats_service.get_current_hit_rate()
             
@@ -142,78 +259,107 @@ class CacheMonitorView(View):
 
 class ArticleListView(View):
     """
-    文章列表视图
+    文章列表视图 - 按(created_at, id)游标分页，只加载列表需要的字段
     """
     
+    # 列表需要的字段，不加载正文
+    LIST_FIELDS = ['id', 'title', 'created_at', 'total_views', 'unique_users', 'unique_ips', 'author__username']
+    
     def get(self, request):
         """
-        获取文章列表
+        获取文章列表（cursor为上一页返回的next_cursor，page_size为每页条数）
         """
         try:
-            articles = Article.objects.filter(is_published=True).select_related('author')
+            page_size = self._get_page_size(request)
+            articles = Article.objects.filter(is_published=True).select_related('author').only(
+                *self.LIST_FIELDS
+            ).order_by('-created_at', '-id')
             
-            # 获取每篇文章的统计数据
+            cursor = request.GET.get('cursor')
+            if cursor:
+                created_at, article_id = self._decode_cursor(cursor)
+                articles = articles.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=article_id)
+                )
+            
+            # 多取一条判断是否还有下一页
+            articles = list(articles[:page_size + 1])
+            has_next = len(articles) > page_size
+            articles = articles[:page_size]
+            next_cursor = self._encode_cursor(articles[-1]) if has_next else None
+            
+            # 批量获取本页文章的统计数据（缓存未命中时直接使用文章行上的计数）
+            stats_map = reading_service.get_many_article_stats([article.id for article in articles], articles)
             articles_data = []
             for article in articles:
-                stats = reading_service.get_article_stats(article.id)
                 articles_data.append({
                     'id': article.id,
                     'title': article.title,
                     'author': article.author.username,
                     'created_at': article.created_at.isoformat(),
-                    'reading_stats': stats
+                    'reading_stats': stats_map.get(article.id, {})
                 })
             
             # 判断是否为API请求
             if request.headers.get('Content-Type') == 'application/json' or \
                request.GET.get('format') == 'json':
-                return ApiResponseHandler.success_response(articles_data, "文章列表获取成功")
+                return ApiResponseHandler.success_response({
+                    'articles': articles_data,
+                    'page_size': page_size,
+                    'has_next': has_next,
+                    'next_cursor': next_cursor
+                }, "文章列表获取成功")
             else:
                 # 返回HTML页面
                 return render(request, 'blog/article_list.html', {
-                    'articles': articles_data
+                    'articles': articles_data,
+                    'page_size': page_size,
+                    'is_first_page': not cursor,
+                    'next_cursor': next_cursor
                 })
                 
         except Exception as e:
             return ApiResponseHandler.handle_exception_response(e, "获取文章列表")
+    
+    def _get_page_size(self, request) -> int:
+        """获取每页条数，限制在1到ARTICLE_LIST_MAX_PAGE_SIZE之间"""
+        default_size = getattr(settings, 'ARTICLE_LIST_PAGE_SIZE', 20)
+        try:
+            page_size = int(request.GET.get('page_size', default_size))
+        except (TypeError, ValueError):
+            page_size = default_size
+        return max(1, min(page_size, getattr(settings, 'ARTICLE_LIST_MAX_PAGE_SIZE', 100)))
+    
+    def _encode_cursor(self, article) -> str:
+        """编码分页游标：本页最后一篇文章的(created_at, id)"""
+        raw = f'{article.created_at.isoformat()}|{article.id}'
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    def _decode_cursor(self, cursor: str):
+        """解码分页游标"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            created_at, article_id = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(article_id)
+        except (ValueError, UnicodeError):
+            raise ValidationException("无效的分页游标", ExceptionLevel.ERROR)
 
 
 class DashboardView(View):
     """
-    统计监控仪表板
+    统计监控仪表板 - 读取后台定时生成的快照
     """
     
     def get(self, request):
         """
-        获取监控仪表板数据
+        获取监控仪表板数据（window为热门文章窗口，fresh=1时跳过快照实时计算）
         """
         try:
-            # 获取当前缓存命中率
-            current_hit_rate = cache_stats_service.get_current_hit_rate()
-            
-            # 获取今日缓存统计
-            daily_stats = cache_stats_service.get_daily_stats()
-            
-            # 获取热门文章统计
-            popular_articles = []
-            articles = Article.objects.filter(is_published=True)[:10]
-            for article in articles:
-                stats = reading_service.get_article_stats(article.id)
-                popular_articles.append({
-                    'id': article.id,
-                    'title': article.title,
-                    'author': article.author.username,
-                    'reading_stats': stats
-                })
-            
-            # 按阅读量排序
-            popular_articles.sort(key=lambda x: x['reading_stats'].get('total_views', 0), reverse=True)
-            
-            dashboard_data = {
-                'current_hit_rate': current_hit_rate,
-                'daily_cache_stats': daily_stats,
-                'popular_articles': popular_articles[:5]  # 只返回前5名
-            }
+            window = request.GET.get('window', 'all')
+            if window not in ReadingCacheService.LEADERBOARD_WINDOWS:
+                raise ValidationException(f"不支持的排行榜窗口: {window}")
+            fresh = request.GET.get('fresh') in ('1', 'true')
+            dashboard_data = dashboard_service.get_dashboard(window, fresh=fresh)
             
             # 判断是否为API请求
             if request.headers.get('Content-Type') == 'application/json' or \
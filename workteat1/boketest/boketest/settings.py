@@ -95,10 +95,80 @@ CACHES = {
 REDIS_HOST = '127.0.0.1'
 REDIS_PORT = 6379
 REDIS_DB = 1
+REDIS_UNIX_SOCKET = None  # 设置后通过unix socket连接，忽略HOST/PORT
+REDIS_MAX_CONNECTIONS = 50  # 每个进程连接池的最大连接数
+REDIS_SOCKET_TIMEOUT = 1.0  # 读写超时（秒）
+REDIS_SOCKET_CONNECT_TIMEOUT = 0.5  # 连接超时（秒）
+REDIS_HEALTH_CHECK_INTERVAL = 30  # 空闲连接健康检查间隔（秒）
+REDIS_CIRCUIT_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断
+REDIS_CIRCUIT_PROBE_INTERVAL = 5  # 熔断后每隔多少秒探测一次Redis是否恢复
 
 # 缓存配置
 READING_STATS_CACHE_TTL = 3600  # 1小时
+READING_STATS_NEGATIVE_TTL = 60  # 阅读量为0的文章的缓存秒数（负缓存）
+READING_STATS_STALE_TTL = 300  # 统计过期后继续作为旧值保留的秒数，刷新期间其他请求读取旧值
+READING_STATS_LEASE_TTL = 10  # 统计重算租约秒数，同一篇文章同时只有一个请求访问数据库
+READING_STATS_LEASE_WAIT = 0.2  # 未拿到租约且没有旧值时，等待其他请求初始化的最长秒数
+READING_STATS_XFETCH_BETA = 1.0  # XFetch提前刷新系数，越大越早刷新
+READER_COUNTS_FIELDS_PER_BUCKET = 64  # 每篇文章用户/IP阅读次数按读者数分桶，每桶的目标字段数；须低于Redis的hash-max-listpack-entries（默认128），超过后桶转为hashtable编码
+READER_COUNTS_MAX_BUCKETS = 1024  # 每篇文章的最大桶数
 CACHE_HIT_RATE_WINDOW = 300  # 5分钟窗口期
+CACHE_STATS_FLUSH_INTERVAL = 1  # 命中率统计在进程内累加的秒数，0表示每次请求直接写入Redis
+CACHE_STATS_RETENTION_DAYS = 8  # 命中率统计在Redis中保留的天数，更早的从CacheHitStats读取
+CACHE_STATS_RANGE_MAX_DAYS = 366  # 命中率范围查询最多的天数
+
+# 缓存值编码配置
+CACHE_DEFAULT_CODEC = 'json'  # 默认编码：json / msgpack / int，可加压缩后缀如 msgpack+zlib、json+lz4
+CACHE_COMPRESS_THRESHOLD = 1024  # 编码后超过该字节数才压缩
+CACHE_KEY_CODECS = {}  # 按键前缀覆盖编码，如 {'dashboard_snapshot:v': 'json+lz4'}
+
+# L1进程内缓存配置（Redis之前的一级缓存）
+L1_CACHE_MAX_ITEMS = 10000  # 最大条目数
+L1_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 最大占用字节数
+L1_STATS_TTL = 5  # 文章统计缓存秒数
+L1_ARTICLE_TTL = 300  # 已发布文章缓存秒数，文章保存时通过Redis pub/sub失效
+
+# 阅读记录写回（write-behind）配置
+READING_WRITE_BEHIND_ENABLED = False  # 开启后阅读事件先进入缓冲，再批量落库
+READING_WRITE_BEHIND_FLUSH_INTERVAL_MS = 1000  # 刷新间隔，也是进程内缓冲的最大丢失窗口
+READING_WRITE_BEHIND_BATCH_SIZE = 500  # 单批最大事件数，缓冲达到该数量时立即刷新
+READING_WRITE_BEHIND_MAX_ATTEMPTS = 5  # 同一事件落库失败达到该次数后移入死信队列reading_buffer:dead
+
+# 阅读去重配置
+READING_DEDUP_WINDOW = 0  # 同一访客在该秒数内对同一文章只计一次阅读（如1800），默认0不去重；开启后总阅读量不再包含刷新
+READING_DEDUP_BLOOM_CAPACITY = 100000  # Redis不可用时进程内布隆过滤器的容量
+READING_DEDUP_BLOOM_ERROR_RATE = 0.001  # 布隆过滤器误判率（误判时少计一次阅读）
+
+# 热点文章采样计数配置
+READING_SAMPLING_QPS_THRESHOLD = 0  # 单进程内一篇文章每秒阅读超过该值时改为采样计数（如50），默认0不采样；开启后热点文章的总阅读量为估计值
+READING_SAMPLING_MAX_RATE = 64  # 最大采样率（每N次记录1次并按N累加）
+
+# 文章页面缓存配置
+ARTICLE_PAGE_CACHE_ENABLED = False  # 开启后匿名访问的文章页整页缓存，阅读量由页面POST到阅读计数接口记录
+ARTICLE_PAGE_CACHE_TTL = 300  # 页面在Redis中的缓存秒数，文章修改后立即使用新页面
+L1_PAGE_TTL = 30  # 页面在进程内缓存的秒数
+
+# 热门文章排行榜配置
+LEADERBOARD_BUCKET_SECONDS = 300  # 小时榜的时间桶粒度
+LEADERBOARD_HOUR_REFRESH = 10  # 小时榜合并结果缓存秒数
+
+# 文章小时阅读量汇总配置
+VIEW_ROLLUP_RETENTION_HOURS = 48  # Redis中小时累计值的保留时间，需大于落库间隔
+TIMESERIES_MAX_DAYS = 90  # 阅读趋势API最多查询的天数
+
+# 仪表板快照配置
+DASHBOARD_SNAPSHOT_INTERVAL = 30  # 后台重新生成仪表板快照的间隔秒数
+DASHBOARD_SNAPSHOT_LEASE_TTL = 30  # 请求路径上生成快照的租约秒数，同一窗口同时只有一个请求计算
+DASHBOARD_SNAPSHOT_LEASE_WAIT = 2.0  # 未拿到租约时等待其他请求生成快照的最长秒数，超时后返回已有快照
+
+# 周期任务调度器配置（python manage.py run_scheduler）
+SCHEDULER_CACHE_STATS_SYNC_INTERVAL = 3600  # 缓存统计同步到数据库的间隔秒数
+SCHEDULER_VIEW_ROLLUP_INTERVAL = 300  # 小时阅读量落库的间隔秒数
+SCHEDULER_RECONCILE_INTERVAL = 3600  # 文章独立用户/IP数对账的间隔秒数
+
+# 文章列表分页配置
+ARTICLE_LIST_PAGE_SIZE = 20  # 默认每页条数
+ARTICLE_LIST_MAX_PAGE_SIZE = 100  # page_size参数上限
 
 
 # Password validation